@@ -1,6 +1,8 @@
 import cv2
 import mediapipe as mp
 import math
+import numpy as np
+from landmarks import fingers_up, hands_from_mediapipe
 
 
 class HandDetector:
@@ -11,120 +13,164 @@ class HandDetector:
     provides bounding box info of the hand found.
     """
 
-    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, minTrackCon=0.5):
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, minTrackCon=0.5,
+                 roiTracking=False, roiMargin=0.5, roiSize=320, roiRefresh=30, recorder=None,
+                 profiler=None):
         """
         :param mode: In static mode, detection is done on each image: slower
         :param maxHands: Maximum number of hands to detect
         :param detectionCon: Minimum Detection Confidence Threshold
         :param minTrackCon: Minimum Tracking Confidence Threshold
+        :param roiTracking: Only process a crop around the previous frame's hands
+        :param roiMargin: Margin added on each side of the hand bbox, relative to its size
+        :param roiSize: Longest side the crop is downsized to before detection
+        :param roiRefresh: Force a full-frame detection after this many cropped frames
+        :param recorder: Optional landmark_trace.TraceRecorder every result is written to
+        :param profiler: Optional profiler.StageProfiler that receives the detection stage timings
         """
         self.mode = mode
         self.maxHands = maxHands
         self.detectionCon = detectionCon
         self.minTrackCon = minTrackCon
+        self.roiTracking = roiTracking
+        self.roiMargin = roiMargin
+        self.roiSize = roiSize
+        self.roiRefresh = roiRefresh
+        self.roiFrames = 0
+        self.recorder = recorder
+        self.profiler = profiler
 
         self.mpHands = mp.solutions.hands
         self.hands = self.mpHands.Hands(static_image_mode=self.mode, max_num_hands=self.maxHands,
                                         min_detection_confidence=self.detectionCon,
                                         min_tracking_confidence=self.minTrackCon)
+        if self.roiTracking:
+            # Separate instance so crops don't disturb the full-frame tracker state
+            self.roiHands = self.mpHands.Hands(static_image_mode=self.mode, max_num_hands=self.maxHands,
+                                               min_detection_confidence=self.detectionCon,
+                                               min_tracking_confidence=self.minTrackCon)
         self.mpDraw = mp.solutions.drawing_utils
         self.tipIds = [4, 8, 12, 16, 20]
         self.fingers = []
         self.lmList = []
+        self.allHands = None
 
-    def findHands(self, img, draw_lm=True, draw_bbox=True, flipType=True):
+    def findHands(self, img, draw_lm=True, draw_bbox=True, flipType=True, timestamp=None):
         """
         Finds hands in a BGR image.
         :param img: Image to find the hands in.
         :param draw_lm: Flag to draw landmarks on the image.
         :param draw_bbox: Flag to draw bounding box on the image.
         :param flipType: Flag to flip the hand type.
-        :return: Hands information and image with or without drawings
+        :param timestamp: Monotonic capture time of the image, stored with the
+            hands by the recorder (default: now)
+        :return: Hands information (a HandsResult) and image with or without drawings
         """
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
-        allHands = []
         h, w, c = img.shape
-        if self.results.multi_hand_landmarks:
-            for handType, handLms in zip(self.results.multi_handedness, self.results.multi_hand_landmarks):
-                myHand = {}
-                ## lmList
-                mylmList = []
-                xList = []
-                yList = []
-                for id, lm in enumerate(handLms.landmark):
-                    px, py, pz = int(lm.x * w), int(lm.y * h), int(lm.z * w)
-                    mylmList.append([px, py, pz])
-                    xList.append(px)
-                    yList.append(py)
-
-                ## bbox
-                xmin, xmax = min(xList), max(xList)
-                ymin, ymax = min(yList), max(yList)
-                boxW, boxH = xmax - xmin, ymax - ymin
-                bbox = xmin, ymin, boxW, boxH
-                cx, cy = bbox[0] + (bbox[2] // 2), bbox[1] + (bbox[3] // 2)
-                bx, by = xmin, ymin
-                tx, ty = xmax, ymax
-
-                myHand["lmList"] = mylmList
-                myHand["bbox"] = bbox
-                myHand["center"] = (cx, cy)
-                myHand["bottom"] = (bx, by)
-                myHand["top"] = (tx, ty)
-
-                if flipType:
-                    if handType.classification[0].label == "Right":
-                        myHand["type"] = "Left"
-                    else:
-                        myHand["type"] = "Right"
-                else:
-                    myHand["type"] = handType.classification[0].label
-                allHands.append(myHand)
-
-                ## draw
-                if draw_lm:
-                    self.mpDraw.draw_landmarks(img, handLms,
-                                               self.mpHands.HAND_CONNECTIONS)
-                if draw_bbox:
-                    cv2.rectangle(img, (bbox[0] - 20, bbox[1] - 20),
-                                  (bbox[0] + bbox[2] + 20, bbox[1] + bbox[3] + 20),
-                                  (255, 0, 255), 2)
-        
+        self.results = None
+        if self.roiTracking:
+            self.results = self.processRoi(img)
+            self.lap("roi")
+        if self.results is None:
+            imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            self.lap("cvtColor")
+            self.results = self.hands.process(imgRGB)
+            self.lap("hands.process")
+            self.roiFrames = 0
+        allHands = hands_from_mediapipe(self.results, w, h, flipType)
+        self.allHands = allHands
+        if self.recorder is not None:
+            self.recorder.record(allHands, timestamp)
+
+        ## draw
+        if draw_lm and self.results.multi_hand_landmarks:
+            for handLms in self.results.multi_hand_landmarks:
+                self.mpDraw.draw_landmarks(img, handLms,
+                                           self.mpHands.HAND_CONNECTIONS)
+        if draw_bbox:
+            for x, y, boxW, boxH in allHands.bbox.tolist():
+                cv2.rectangle(img, (x - 20, y - 20),
+                              (x + boxW + 20, y + boxH + 20),
+                              (255, 0, 255), 2)
+
         if draw_lm or draw_bbox:
             return allHands, img
         else:
             return allHands
 
+    def lap(self, name):
+        """Record a stage timing if a profiler is attached."""
+        if self.profiler is not None:
+            self.profiler.lap(name)
+
+    def findRoi(self, w, h):
+        """
+        Square crop around the hands found in the previous frame.
+        :param w: Width of the full image
+        :param h: Height of the full image
+        :return: Crop as (x0, y0, x1, y1), or None if there is nothing to track
+        """
+        if self.allHands is None or not self.allHands or self.allHands.shape != (h, w):
+            return None
+        xmin, ymin = self.allHands.bottom.min(axis=0).tolist()
+        xmax, ymax = self.allHands.top.max(axis=0).tolist()
+        side = int(max(xmax - xmin, ymax - ymin) * (1 + 2 * self.roiMargin))
+        side = min(max(side, 64), w, h)
+        cx, cy = (xmin + xmax) // 2, (ymin + ymax) // 2
+        x0 = min(max(cx - side // 2, 0), w - side)
+        y0 = min(max(cy - side // 2, 0), h - side)
+        return x0, y0, x0 + side, y0 + side
+
+    def processRoi(self, img, edge=0.02):
+        """
+        Runs detection on a downsized crop around the previous hands and maps
+        the landmarks back to full-frame coordinates in place.
+        :param img: Full BGR image
+        :param edge: Landmarks closer than this to the crop border (normalized)
+                     mean the hand is leaving the crop
+        :return: Mediapipe results in full-frame coordinates, or None when a
+                 full-frame detection is needed instead
+        """
+        h, w, c = img.shape
+        roi = self.findRoi(w, h)
+        if roi is None or self.roiFrames >= self.roiRefresh:
+            return None
+        x0, y0, x1, y1 = roi
+        cropW, cropH = x1 - x0, y1 - y0
+        crop = img[y0:y1, x0:x1]
+        scale = self.roiSize / max(cropW, cropH)
+        if scale < 1:
+            crop = cv2.resize(crop, (int(cropW * scale), int(cropH * scale)), interpolation=cv2.INTER_AREA)
+        results = self.roiHands.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        if not results.multi_hand_landmarks:
+            return None
+
+        for handType, handLms in zip(results.multi_handedness, results.multi_hand_landmarks):
+            if handType.classification[0].score < self.minTrackCon:
+                return None
+            xs = [lm.x for lm in handLms.landmark]
+            ys = [lm.y for lm in handLms.landmark]
+            if min(xs) < edge or min(ys) < edge or max(xs) > 1 - edge or max(ys) > 1 - edge:
+                return None
+
+        for handLms in results.multi_hand_landmarks:
+            for lm in handLms.landmark:
+                lm.x = (x0 + lm.x * cropW) / w
+                lm.y = (y0 + lm.y * cropH) / h
+                lm.z = lm.z * cropW / w
+        self.roiFrames += 1
+        return results
+
     def fingersUp(self, myHand):
         """
         Finds how many fingers are open and returns in a list.
-        Considers left and right hands separately
+        Considers left and right hands separately. Only looks at the hand
+        passed in; see landmarks.fingers_up for many hands at once.
         :return: List of which fingers are up
         """
-        myHandType = myHand["type"]
-        myLmList = myHand["lmList"]
-        if self.results.multi_hand_landmarks:
-            fingers = []
-            # Thumb
-            if myHandType == "Right":
-                if myLmList[self.tipIds[0]][0] > myLmList[self.tipIds[0] - 1][0]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-            else:
-                if myLmList[self.tipIds[0]][0] < myLmList[self.tipIds[0] - 1][0]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-
-            # 4 Fingers
-            for id in range(1, 5):
-                if myLmList[self.tipIds[id]][1] < myLmList[self.tipIds[id] - 2][1]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-        return fingers
+        fingers = fingers_up(myHand["lmList"], myHand["type"] == "Right")
+        self.fingers = fingers[0].tolist()
+        return self.fingers
 
     def findDistance(self, p1, p2, img=None):
         """
@@ -160,29 +206,30 @@ class HandDetector:
         :param draw: Flag to draw the output on the image.
         :return: Landmark list and bounding box
         """
-        xList = []
-        yList = []
-        bbox = []
         self.lmList = []
+        bbox = 0, 0, 0, 0
         if self.results.multi_hand_landmarks:
-            myHand = self.results.multi_hand_landmarks[handNo]
-            for id, lm in enumerate(myHand.landmark):
-                h, w, c = img.shape
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                xList.append(cx)
-                yList.append(cy)
-                self.lmList.append([id, cx, cy])
-                if draw:
+            h, w, c = img.shape
+            if self.allHands is not None and self.allHands.shape == (h, w):
+                pixels = self.allHands.pixels[handNo, :, :2]
+            else:
+                myHand = self.results.multi_hand_landmarks[handNo]
+                raw = np.array([(lm.x, lm.y) for lm in myHand.landmark], dtype=np.float64)
+                pixels = (raw * (w, h)).astype(np.int32)
+            ids = np.arange(len(pixels), dtype=np.int32)[:, None]
+            self.lmList = np.hstack([ids, pixels]).tolist()
+            xmin, ymin = pixels.min(axis=0).tolist()
+            xmax, ymax = pixels.max(axis=0).tolist()
+            bbox = xmin, ymin, xmax, ymax
+            if draw:
+                for _, cx, cy in self.lmList:
                     cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
-     
-        xmin, xmax = min(xList, default=0), max(xList, default=0)
-        ymin, ymax = min(yList, default=0), max(yList, default=0)
-        bbox = xmin, ymin, xmax, ymax
-     
+
         if draw:
+            xmin, ymin, xmax, ymax = bbox
             cv2.rectangle(img, (xmin - 20, ymin - 20), (xmax + 20, ymax + 20),
             (0, 255, 0), 2)
-     
+
         return self.lmList, bbox
 
 
@@ -0,0 +1,474 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class Stroke:
+    """
+    One annotation line stored as a growable (n, 2) int32 point buffer.
+
+    Points are decimated as they stream in: a point closer than
+    `min_distance` to the previous one is dropped, and a point that keeps the
+    line within `tolerance` pixels of every point merged since the last kept
+    vertex replaces the last vertex instead of adding one (a streaming
+    variant of Ramer-Douglas-Peucker). Straight and slow parts of a stroke
+    therefore cost a handful of vertices instead of one per frame.
+    """
+
+    def __init__(self, min_distance=2.0, tolerance=1.0, capacity=64, max_run=64):
+        """
+        Args:
+            min_distance: Points closer than this to the previous one are dropped
+            tolerance: Maximum distance in pixels between the stored line and
+                the points merged into it
+            capacity: Initial buffer size in points
+            max_run: Most points merged into one segment, bounds the cost of a point
+        """
+        self.min_distance = min_distance
+        self.tolerance = tolerance
+        self.max_run = max_run
+        self.buffer = np.empty((capacity, 2), dtype=np.int32)
+        self.count = 0
+        self.run = []  # points merged into the last segment since the last kept vertex
+        self.last = None  # last accepted input point
+        self.last_segment = None  # newest (p0, p1) segment to rasterize
+        # Page to display mapping the stroke was drawn in, e.g. a zoomed
+        # viewport (see SlideDeck.viewport_transform); None for the fitted page
+        self.transform = None
+
+    @classmethod
+    def from_points(cls, points, **kw):
+        """Build a stroke from a sequence of (x, y) points."""
+        stroke = cls(**kw)
+        for point in points:
+            stroke.append(point)
+        stroke.finish()
+        return stroke
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def points(self):
+        """(n, 2) int32 view of the stored vertices."""
+        return self.buffer[:self.count]
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    def append(self, point):
+        """
+        Add a point to the stroke.
+
+        Args:
+            point: (x, y) in pixels
+
+        Returns:
+            True if the point was accepted; `last_segment` then holds the new
+            segment to draw. False if it was too close to the previous point.
+        """
+        point = (int(point[0]), int(point[1]))
+        if self.last is not None:
+            dx, dy = point[0] - self.last[0], point[1] - self.last[1]
+            if dx * dx + dy * dy < self.min_distance * self.min_distance:
+                return False
+            self.last_segment = (self.last, point)
+        self.last = point
+
+        n = self.count
+        if n >= 2 and len(self.run) < self.max_run:
+            candidates = self.run + [tuple(self.buffer[n - 1])]
+            if self._max_deviation(self.buffer[n - 2], point, candidates) <= self.tolerance:
+                self.run = candidates
+                self.buffer[n - 1] = point
+                return True
+        self.run = []
+        if n == len(self.buffer):
+            # Double the buffer; finish() may have shrunk it to nothing
+            grow = np.empty((max(n, 16), 2), dtype=self.buffer.dtype)
+            self.buffer = np.concatenate([self.buffer, grow])
+        self.buffer[n] = point
+        self.count = n + 1
+        return True
+
+    @staticmethod
+    def _max_deviation(a, b, points):
+        """Largest distance from `points` to the segment a-b."""
+        pts = np.asarray(points, dtype=np.float32)
+        a = a.astype(np.float32)
+        ab = np.asarray(b, dtype=np.float32) - a
+        length2 = float(ab @ ab)
+        ap = pts - a
+        t = np.clip(ap @ ab / length2, 0, 1) if length2 > 0 else np.zeros(len(pts), dtype=np.float32)
+        d = ap - t[:, None] * ab
+        return float(np.sqrt((d * d).sum(axis=1).max()))
+
+    def finish(self):
+        """Release the unused part of the buffer once the stroke is complete."""
+        if len(self.buffer) > self.count:
+            self.buffer = self.buffer[:self.count].copy()
+        self.run = []
+
+
+class AnnotationLayer:
+    """
+    Persistent raster of the annotations on one slide. Strokes are drawn
+    into a BGR layer and a coverage mask once, as their points arrive, and
+    the layer is composited onto each frame through the mask. Only the
+    bounding box of the ink is touched when compositing, so the per-frame
+    cost no longer grows with the number of points drawn; the layer is
+    replayed from the strokes only after an erase.
+
+    With anti-aliased lines the mask is an alpha channel and the layer holds
+    colours premultiplied by it: cv2.line blends both the same way, which is
+    exactly the "over" operator, so compositing gives the same pixels as
+    drawing the strokes straight onto the frame.
+    """
+
+    def __init__(self, width, height, color=(0, 0, 255), thickness=4, line_type=cv2.LINE_AA,
+                 shadow_color=None, shadow_offset=(3, 3)):
+        """
+        Args:
+            width: Width of the frames the layer is composited on
+            height: Height of the frames the layer is composited on
+            color: BGR stroke colour
+            thickness: Stroke thickness in pixels
+            line_type: OpenCV line type used for the strokes
+            shadow_color: BGR colour of a drop shadow, or None for no shadow
+            shadow_offset: (dx, dy) offset of the shadow
+        """
+        self.width = width
+        self.height = height
+        self.color = color
+        self.thickness = thickness
+        self.line_type = line_type
+        self.shadow_color = shadow_color
+        self.shadow_offset = shadow_offset
+        self.layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        self.bbox = None  # (x0, y0, x1, y1) of the inked area, None when empty
+
+    def reset(self):
+        """Remove all ink."""
+        if self.bbox is not None:
+            x0, y0, x1, y1 = self.bbox
+            self.layer[y0:y1, x0:x1] = 0
+            self.mask[y0:y1, x0:x1] = 0
+        self.bbox = None
+
+    def add_segment(self, p0, p1):
+        """Rasterize one stroke segment from p0 to p1."""
+        self._line(p0, p1)
+        pad = self.thickness // 2 + 2
+        xs, ys = [p0[0], p1[0]], [p0[1], p1[1]]
+        if self.shadow_color is not None:
+            dx, dy = self.shadow_offset
+            s0, s1 = (p0[0] + dx, p0[1] + dy), (p1[0] + dx, p1[1] + dy)
+            xs += [s0[0], s1[0]]
+            ys += [s0[1], s1[1]]
+        self._grow(min(xs) - pad, min(ys) - pad, max(xs) + pad + 1, max(ys) + pad + 1)
+
+    def _line(self, p0, p1):
+        # The segment, then its shadow: the order every drawing path uses
+        cv2.line(self.layer, p0, p1, self.color, self.thickness, self.line_type)
+        cv2.line(self.mask, p0, p1, 255, self.thickness, self.line_type)
+        if self.shadow_color is not None:
+            dx, dy = self.shadow_offset
+            s0, s1 = (p0[0] + dx, p0[1] + dy), (p1[0] + dx, p1[1] + dy)
+            cv2.line(self.layer, s0, s1, self.shadow_color, self.thickness, self.line_type)
+            cv2.line(self.mask, s0, s1, 255, self.thickness, self.line_type)
+
+    def add_point(self, stroke):
+        """
+        Rasterize the newest segment of a stroke. Call after Stroke.append
+        accepted a point.
+
+        Args:
+            stroke: The Stroke being drawn
+        """
+        if stroke.last_segment is not None:
+            self.add_segment(*stroke.last_segment)
+
+    def rebuild(self, strokes):
+        """
+        Redraw the layer from scratch, e.g. after a stroke was erased.
+
+        Args:
+            strokes: Sequence of Strokes; empty entries are skipped
+        """
+        self.reset()
+        self.draw(strokes)
+
+    def draw(self, strokes):
+        """
+        Add complete strokes to the layer. Without a shadow all strokes go
+        through a single cv2.polylines call. With one, every segment and
+        then its shadow is drawn, stroke by stroke, the same order as
+        add_segment, so a rebuilt layer looks like the live one.
+
+        Args:
+            strokes: Sequence of Strokes; empty entries are skipped
+        """
+        lines = [stroke.points for stroke in strokes if len(stroke) >= 2]
+        if not lines:
+            return
+        if self.shadow_color is None:
+            cv2.polylines(self.layer, lines, False, self.color, self.thickness, self.line_type)
+            cv2.polylines(self.mask, lines, False, 255, self.thickness, self.line_type)
+        else:
+            for line in lines:
+                points = line.tolist()
+                for p0, p1 in zip(points, points[1:]):
+                    self._line(p0, p1)
+        pad = self.thickness // 2 + 2
+        low = np.min([line.min(axis=0) for line in lines], axis=0) - pad
+        high = np.max([line.max(axis=0) for line in lines], axis=0) + pad + 1
+        self._grow(low[0], low[1], high[0], high[1])
+        if self.shadow_color is not None:
+            dx, dy = self.shadow_offset
+            self._grow(low[0] + dx, low[1] + dy, high[0] + dx, high[1] + dy)
+
+    def _grow(self, x0, y0, x1, y1):
+        x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if self.bbox is None:
+            self.bbox = (x0, y0, x1, y1)
+        else:
+            bx0, by0, bx1, by1 = self.bbox
+            self.bbox = (min(bx0, x0), min(by0, y0), max(bx1, x1), max(by1, y1))
+
+    def composite(self, img):
+        """
+        Draw the ink onto an image in place.
+
+        Args:
+            img: (height, width, 3) uint8 image
+
+        Returns:
+            The same image
+        """
+        if self.bbox is None:
+            return img
+        x0, y0, x1, y1 = self.bbox
+        roi = img[y0:y1, x0:x1]
+        layer, mask = self.layer[y0:y1, x0:x1], self.mask[y0:y1, x0:x1]
+        if self.line_type != cv2.LINE_AA:
+            cv2.copyTo(layer, mask, roi)
+            return img
+        # roi = layer + roi * (1 - alpha)
+        inverse = cv2.cvtColor(cv2.bitwise_not(mask), cv2.COLOR_GRAY2BGR)
+        cv2.multiply(roi, inverse, dst=roi, scale=1 / 255)
+        cv2.add(roi, layer, dst=roi)
+        return img
+
+
+class AnnotationStore:
+    """
+    Annotations of every slide of a deck, with an undo/redo history per
+    slide. Strokes are kept for all slides as compact Stroke arrays, while
+    rasterized layers are only kept for the few most recently shown slides:
+    going back to one of those is instant, older ones are redrawn from their
+    strokes (see AnnotationLayer.draw), reusing an evicted layer's buffers.
+    """
+
+    def __init__(self, width, height, max_layers=3, max_history=100, **layer_kw):
+        """
+        Args:
+            width: Width of the frames the annotations are composited on
+            height: Height of the frames the annotations are composited on
+            max_layers: Number of slide layers kept rasterized
+            max_history: Undo steps kept per slide
+            **layer_kw: Stroke style passed to AnnotationLayer
+        """
+        self.width = width
+        self.height = height
+        self.max_layers = max_layers
+        self.max_history = max_history
+        self.layer_kw = layer_kw
+        self.slides = {}    # slide number -> list of Strokes
+        self.history = {}   # slide number -> list of (action, payload) that can be undone
+        self.future = {}    # slide number -> list of undone (action, payload) that can be redone
+        self.layers = OrderedDict()  # slide number -> AnnotationLayer, least recently shown first
+        self.active = None  # stroke being drawn
+        self.slide_num = None
+        self.layer = None
+        self.set_slide(0)
+
+    @property
+    def strokes(self):
+        """Strokes of the current slide, oldest first."""
+        return self.slides.setdefault(self.slide_num, [])
+
+    @property
+    def drawing(self):
+        return self.active is not None
+
+    def set_slide(self, slide_num):
+        """Show the annotations of another slide. Ends the stroke being drawn."""
+        if slide_num == self.slide_num:
+            return
+        self.end_stroke()
+        self.slide_num = slide_num
+        layer = self.layers.pop(slide_num, None)
+        if layer is None:
+            if len(self.layers) >= self.max_layers:
+                _, layer = self.layers.popitem(last=False)
+                layer.reset()
+            else:
+                layer = AnnotationLayer(self.width, self.height, **self.layer_kw)
+            layer.draw(self.strokes)
+        self.layers[slide_num] = layer
+        self.layer = layer
+
+    def reset(self):
+        """Forget the annotations of all slides, e.g. when another file is opened."""
+        self.active = None
+        self.slides.clear()
+        self.history.clear()
+        self.future.clear()
+        for layer in self.layers.values():
+            layer.reset()
+
+    def _record(self, action, payload):
+        history = self.history.setdefault(self.slide_num, [])
+        history.append((action, payload))
+        if len(history) > self.max_history:
+            del history[0]
+        self.future.pop(self.slide_num, None)
+
+    def begin_stroke(self, transform=None):
+        """
+        Start a new stroke on the current slide.
+
+        Args:
+            transform: (scale, offset_x, offset_y) page to display mapping of
+                the view the stroke is drawn on, kept for exporting it
+        """
+        self.end_stroke()
+        self.active = Stroke()
+        self.active.transform = transform
+        self.strokes.append(self.active)
+
+    def add_point(self, point):
+        """Add a point to the stroke being drawn and rasterize its new segment."""
+        if self.active is not None and self.active.append(point):
+            self.layer.add_point(self.active)
+
+    def end_stroke(self):
+        """
+        Finish the stroke being drawn and make it an undo step. Strokes too
+        short to be visible are discarded.
+        """
+        stroke, self.active = self.active, None
+        if stroke is None:
+            return
+        stroke.finish()
+        if len(stroke) < 2:
+            self.strokes.pop()
+        else:
+            self._record("draw", stroke)
+
+    def extend(self, strokes):
+        """Add complete strokes to the current slide as one undo step per stroke."""
+        self.end_stroke()
+        for stroke in strokes:
+            self.strokes.append(stroke)
+            self._record("draw", stroke)
+        self.layer.draw(strokes)
+
+    def erase_last(self):
+        """
+        Erase the most recent stroke on the current slide.
+
+        Returns:
+            True if a stroke was erased
+        """
+        self.end_stroke()
+        if not self.strokes:
+            return False
+        self._record("erase", self.strokes.pop())
+        self.layer.rebuild(self.strokes)
+        return True
+
+    def clear(self):
+        """
+        Erase all strokes on the current slide.
+
+        Returns:
+            True if there was anything to clear
+        """
+        self.end_stroke()
+        if not self.strokes:
+            return False
+        self._record("clear", self.slides.pop(self.slide_num))
+        self.layer.reset()
+        return True
+
+    def undo(self):
+        """
+        Undo the last draw, erase or clear on the current slide.
+
+        Returns:
+            True if something was undone
+        """
+        self.end_stroke()
+        history = self.history.get(self.slide_num)
+        if not history:
+            return False
+        action, payload = history.pop()
+        self.future.setdefault(self.slide_num, []).append((action, payload))
+        self._apply(action, payload, undo=True)
+        return True
+
+    def redo(self):
+        """
+        Redo the last undone step on the current slide.
+
+        Returns:
+            True if something was redone
+        """
+        self.end_stroke()
+        future = self.future.get(self.slide_num)
+        if not future:
+            return False
+        action, payload = future.pop()
+        self.history.setdefault(self.slide_num, []).append((action, payload))
+        self._apply(action, payload, undo=False)
+        return True
+
+    def _apply(self, action, payload, undo):
+        # The history is linear, so a stroke being removed again is always the last one
+        strokes = self.strokes
+        if action == "clear":
+            if undo:
+                strokes.extend(payload)
+                self.layer.draw(payload)
+            else:
+                strokes.clear()
+                self.layer.reset()
+        elif (action == "draw") != undo:
+            strokes.append(payload)
+            self.layer.draw([payload])
+        else:
+            strokes.pop()
+            self.layer.rebuild(strokes)
+
+    def snapshot(self):
+        """
+        Copy of all annotations, e.g. for exporting on another thread.
+
+        Returns:
+            Dict of slide number -> list of (points, transform) per stroke,
+            points as an (n, 2) int32 array, for slides that have strokes
+        """
+        return {slide_num: [(stroke.points.copy(), stroke.transform) for stroke in strokes]
+                for slide_num, strokes in self.slides.items() if strokes}
+
+    def composite(self, img):
+        """Draw the current slide's annotations onto an image in place."""
+        return self.layer.composite(img)
@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 import cv2
+import multiprocessing
 import os
 import numpy as np
-import time
-import fitz  # PyMuPDF for handling PDFs
 from HandTracker import HandDetector
 from file_manager import FileManager
+from camera import CameraStream
+from async_detector import AsyncHandDetector
+from prediction import PredictiveHandDetector
+from landmark_trace import TraceRecorder
+from landmarks import HandsResult
+from profiler import StageProfiler
+from slides import SlideDeck
+from raster_cache import DiskRasterCache
+from utils import fit_to_frame
+from gestures import GestureEngine, pointer_position
+from motion import MotionDetector
+from classifier import GestureClassifier
+from filters import HandSmoother
+from annotations import AnnotationStore
+from pdf_export import PDFExportJob
 
 def main():
     """
@@ -20,22 +34,36 @@ def main():
     width, height = 1280, 720
     ge_thresh_y = 450  # Increased threshold for easier gesture detection
     ge_thresh_x = 650  # Reduced threshold to give more space for gestures
-    gest_done = False
-    gest_counter = 0
-    delay = 15  # Reduced delay for more responsive gestures
-    annotations = [[]]
-    annot_num = 0
     annot_start = False
+    # Annotations of every slide with undo/redo; strokes are rasterized once as they are drawn
+    annotation_store = AnnotationStore(width, height, shadow_color=(100, 100, 100))
+    export_job = None  # Background export of the annotated deck, started with 'S'
     slide_images = []
     slide_num = 0
+    prefetched_slide = -1  # Slide whose neighbours were last queued for prefetching
+    # Directory to keep rendered pages in across runs, e.g. raster_cache.DEFAULT_CACHE_DIR; None disables it
+    raster_cache_dir = None
+    disk_cache = DiskRasterCache(raster_cache_dir) if raster_cache_dir else None
     hs, ws = int(120 * 1.2), int(213 * 1.2)
     # Zoom variables
     zoom_level = 1.0
     zoom_change = 0.1  # Amount to zoom in/out per gesture
     min_zoom = 0.5
     max_zoom = 2.0
-    last_gesture_time = time.time()
-    gesture_cooldown = 0.3  # Seconds between gestures for better responsiveness
+    zoom_center = None  # Viewport center in normalized page coordinates, None for the page center
+    # Seconds between two gestures; gestures also need to be seen on 3 of 5 frames
+    # and released before firing again, so this can stay short
+    gesture_cooldown = 0.15
+    # Landmark smoothing per action: a steady pointer at rest, strokes that follow the hand closely
+    pointer_smoothing = {
+        "POINTER": HandSmoother("one_euro", min_cutoff=1.0, beta=0.05),
+        "DRAW": HandSmoother("kalman", process_noise=5e4, measurement_noise=4.0),
+    }
+    pointer_tips = {}  # action -> smoothed index finger tip mapped to the screen
+    # Trained pose classifier (see classifier.py) used instead of the fingersUp rules, e.g. "gestures.npz"
+    gesture_model = None
+    classifier = GestureClassifier.load(gesture_model) if gesture_model else None
+    slide_current = None
     
     # Create a named window that can be resized
     cv2.namedWindow("Slides", cv2.WINDOW_NORMAL)
@@ -58,9 +86,27 @@ def main():
     
     cap.set(3, width)
     cap.set(4, height)
+    # Capture on a background thread so we always process the newest frame
+    cap = CameraStream(cap).start()
     
     # Hand detector setup
-    detector = HandDetector(detectionCon=0.8, maxHands=1)
+    async_detection = False  # Run MediaPipe in a worker process instead of the UI thread
+    max_result_age = 0.25  # Seconds after which an async detection result is too old to act on
+    last_result_id = -1  # Frame id of the async result used on the previous frame
+    trace_dir = None  # Directory to record detected landmarks into for later replay
+    recorder = TraceRecorder(trace_dir) if trace_dir else None
+    # Per-stage frame timings; 'P' toggles the on-screen HUD
+    profiler = StageProfiler()
+    show_perf_hud = False
+    perf_log = None  # e.g. "latency.csv" or "latency.json" to dump the stage timings at exit
+    if async_detection:
+        detector = AsyncHandDetector(detectionCon=0.8, maxHands=1, roiTracking=True)
+    else:
+        detector = HandDetector(detectionCon=0.8, maxHands=1, roiTracking=True, recorder=recorder,
+                                profiler=profiler)
+        # Run MediaPipe every 2nd-4th frame and extrapolate landmarks in between,
+        # keeping detection under half of the frame time
+        detector = PredictiveHandDetector(detector, cadence=2, max_cadence=4, cpu_target=0.5)
     
     # Show file dialog to select a presentation
     file_path = file_manager.show_file_dialog()
@@ -70,17 +116,12 @@ def main():
         
         if file_path.lower().endswith(".pdf"):
             try:
-                doc = fitz.open(file_path)
-                print(f"PDF loaded with {len(doc)} pages")
-                
-                for page in doc:
-                    pix = page.get_pixmap()
-                    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3)
-                    # Convert from RGB to BGR (OpenCV format)
-                    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                    slide_images.append(img)
-                
-                print(f"Successfully loaded {len(slide_images)} slides from PDF")
+                # Pages are rasterized on demand and kept in a bounded LRU cache
+                slide_images = SlideDeck.open(file_path, size=(width, height), disk_cache=disk_cache)
+                print(f"PDF loaded with {len(slide_images)} pages")
+                if disk_cache is not None:
+                    # Fill the disk cache for the whole deck on a few worker processes
+                    slide_images.rasterize_all(processes=2)
             except Exception as e:
                 print(f"Error loading PDF file: {e}")
                 # Create a blank slide with error message
@@ -135,19 +176,118 @@ def main():
         
         slide_images.append(blank)
     
+    # Gesture handlers, looked up by the gesture engine from the packed finger state.
+    # A handler returning False did not apply and is retried on the next frame.
+    def prev_slide(hand):
+        nonlocal slide_num
+        if slide_num <= 0:
+            return False
+        slide_num -= 1
+
+    def next_slide(hand):
+        nonlocal slide_num
+        if slide_num >= len(slide_images) - 1:
+            return False
+        slide_num += 1
+
+    def clear_annotations(hand):
+        annotation_store.clear()  # undoable with 'U'
+
+    def zoom_in(hand):
+        nonlocal zoom_level
+        zoom_level = min(zoom_level + zoom_change, max_zoom)
+        print(f"Zoom in: {zoom_level:.1f}x")
+
+    def zoom_out(hand):
+        nonlocal zoom_level
+        zoom_level = max(zoom_level - zoom_change, min_zoom)
+        print(f"Zoom out: {zoom_level:.1f}x")
+
+    def reset_zoom(hand):
+        nonlocal zoom_level, zoom_center
+        zoom_level = 1.0
+        zoom_center = None
+        print("Zoom reset to 1.0x")
+
+    def first_slide(hand):
+        nonlocal slide_num
+        slide_num = 0
+
+    def last_slide(hand):
+        nonlocal slide_num
+        slide_num = len(slide_images) - 1
+
+    def pan(hand):
+        nonlocal zoom_center
+        if zoom_level <= 1.0:
+            return False
+        cx, cy = hand["center"]
+        zoom_center = (float(np.interp(cx, [width // 2, width], [0, 1])),
+                       float(np.interp(cy, [150, height - 150], [0, 1])))
+
+    def show_pointer(hand):
+        # Make pointer more visible with a larger circle and contrasting colors
+        index_fing = pointer_tips["POINTER"]
+        cv2.circle(slide_current, index_fing, 5, (0, 0, 255), cv2.FILLED)  # Red fill
+        cv2.circle(slide_current, index_fing, 6, (0, 0, 0), 2)  # Black outline
+
+    def draw(hand):
+        nonlocal annot_start
+        index_fing = pointer_tips["DRAW"]
+        if not annot_start:
+            annot_start = True
+            transform = None
+            if isinstance(slide_images, SlideDeck):
+                # Remember the viewport, so the export places the line on the page
+                transform = slide_images.viewport_transform(slide_num, zoom_level, zoom_center)
+            annotation_store.begin_stroke(transform)
+        # Add point to annotation; points that add no detail are dropped
+        annotation_store.add_point(index_fing)
+        # Draw more visible drawing point
+        cv2.circle(slide_current, index_fing, 4, (0, 0, 255), cv2.FILLED, cv2.LINE_AA)
+
+    def erase(hand):
+        return annotation_store.erase_last()  # undoable with 'U'
+
+    gesture_engine = GestureEngine(ge_thresh_x, ge_thresh_y, cooldown=gesture_cooldown, motion=MotionDetector())
+    gesture_engine.bind_all({
+        "PREV_SLIDE": prev_slide, "NEXT_SLIDE": next_slide, "CLEAR_ANNOTATIONS": clear_annotations,
+        "ZOOM_IN": zoom_in, "ZOOM_OUT": zoom_out, "RESET_ZOOM": reset_zoom,
+        "FIRST_SLIDE": first_slide, "LAST_SLIDE": last_slide, "PAN": pan,
+        "POINTER": show_pointer, "DRAW": draw, "ERASE": erase,
+        "SWIPE_LEFT": next_slide, "SWIPE_RIGHT": prev_slide,
+        "CIRCLE_CW": reset_zoom, "CIRCLE_CCW": reset_zoom,
+    })
+    
     print("Application started. Press 'H' for help, 'O' to open a file, 'Q' to quit.")
     
     while True:
+        profiler.begin_frame()
         success, frame = cap.read()
+        frame_time = cap.frame_time  # capture time, so gesture timing follows the camera
         if not success:
             print("Failed to capture frame from webcam")
             break
+        profiler.lap("cap.read")
+        profiler.update_dropped(cap.dropped)
             
         frame = cv2.flip(frame, 1)
+        profiler.lap("flip")
+        
+        # Render neighbouring slides in the background whenever the slide changes
+        if isinstance(slide_images, SlideDeck) and slide_num != prefetched_slide:
+            slide_images.prefetch(slide_num)
+            prefetched_slide = slide_num
+        # Each slide keeps its own annotations
+        annotation_store.set_slide(slide_num)
         
         if slide_images:
+            # Zoom PDF slides by rendering only the visible part at the zoomed resolution
+            if isinstance(slide_images, SlideDeck) and (zoom_level != 1.0 or zoom_center is not None):
+                slide_current = fit_to_frame(slide_images.render_viewport(slide_num, zoom_level, zoom_center),
+                                             width, height)
             # Apply zoom level to the slide
-            if zoom_level != 1.0:
+            elif zoom_level != 1.0:
                 # Get dimensions for zoomed image
                 h, w = slide_images[slide_num].shape[:2]
                 new_h, new_w = int(h * zoom_level), int(w * zoom_level)
@@ -184,188 +324,71 @@ def main():
                     slide_current[offset_y:offset_y+(end_y-start_y), offset_x:offset_x+(end_x-start_x)] = zoomed_img[start_y:end_y, start_x:end_x]
                 except ValueError:
                     # If any issues with dimensions, fallback to standard resize
-                    slide_current = cv2.resize(slide_images[slide_num], (width, height))
+                    slide_current = fit_to_frame(slide_images[slide_num], width, height)
             else:
-                # Normal resize if zoom_level is 1.0
-                slide_current = cv2.resize(slide_images[slide_num], (width, height))
+                # PDF pages are rendered at display resolution, so this is just a copy
+                slide_current = fit_to_frame(slide_images[slide_num], width, height)
         else:
             slide_current = np.ones((height, width, 3), dtype=np.uint8) * 255
             cv2.putText(slide_current, "No slides available", (width//2 - 150, height//2), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        profiler.lap("slide")
 
         # Find hand and landmarks
-        hands, frame = detector.findHands(frame)
+        repeated = False
+        if async_detection:
+            hands = detector.findHands(frame, frame_time)
+            # The same result again holds no new detection; one from long ago is dropped
+            repeated = detector.result_id == last_result_id
+            last_result_id = detector.result_id
+            if detector.result_time is None or frame_time - detector.result_time > max_result_age:
+                hands = HandsResult.empty(shape=frame.shape[:2])
+        else:
+            hands, frame = detector.findHands(frame, timestamp=frame_time)
+        profiler.lap("detect")
         
-        if hands and not gest_done:
-            hand = hands[0]
-            cx, cy = hand["center"]
-            lm_list = hand["lmList"]
-            fingers = detector.fingersUp(hand)
-
-            x_val = int(np.interp(lm_list[8][0], [width // 2, width], [0, width]))
-            y_val = int(np.interp(lm_list[8][1], [150, height - 150], [0, height]))
-            index_fing = (x_val, y_val)
-
-            # Check if enough time has passed since last gesture (for responsiveness)
-            current_time = time.time()
-            time_since_last = current_time - last_gesture_time
-            can_perform_gesture = time_since_last > gesture_cooldown
-
-            if cy < ge_thresh_y and cx > ge_thresh_x:
-                annot_start = False
-
-                # Previous Slide
-                if fingers == [1, 0, 0, 0, 0] and can_perform_gesture:
-                    annot_start = False
-                    if slide_num > 0:
-                        gest_done = True
-                        slide_num -= 1
-                        annotations = [[]]
-                        annot_num = 0
-                        last_gesture_time = current_time
-
-                # Next Slide
-                if fingers == [0, 1, 1, 1, 1] and can_perform_gesture:
-                    annot_start = False
-                    if slide_num < len(slide_images) - 1:
-                        gest_done = True
-                        slide_num += 1
-                        annotations = [[]]
-                        annot_num = 0
-                        last_gesture_time = current_time
-
-                # Clear Annotations
-                if fingers == [1, 1, 1, 1, 1] and can_perform_gesture:
-                    if annotations:
-                        annot_start = False
-                        annotations.clear()
-                        annot_num = 0
-                        gest_done = True
-                        annotations = [[]]
-                        last_gesture_time = current_time
-                        
-                # Zoom In - Pinch gesture (thumb + index)
-                if fingers == [1, 1, 0, 0, 0] and can_perform_gesture:
-                    # Check distance between thumb and index finger
-                    if lm_list[4] and lm_list[8]:  # Thumb tip and index tip
-                        # Calculate distance
-                        thumb_tip = lm_list[4]
-                        index_tip = lm_list[8]
-                        dx = thumb_tip[0] - index_tip[0]
-                        dy = thumb_tip[1] - index_tip[1]
-                        distance = np.sqrt(dx*dx + dy*dy)
-                        
-                        # Wide spread indicates zoom in
-                        if distance > 100:  # Large distance = zoom in
-                            zoom_level = min(zoom_level + zoom_change, max_zoom)
-                            last_gesture_time = current_time
-                            print(f"Zoom in: {zoom_level:.1f}x")
-                
-                
-                # Zoom Out - Spread gesture (thumb + index + spread)
-                if fingers == [0, 0, 1, 1, 1] and can_perform_gesture:
-                    # Check if thumb and index are spread apart
-                    if lm_list[4] and lm_list[8]:  # Thumb tip and index tip
-                        # Calculate distance
-                        thumb_tip = lm_list[4]
-                        index_tip = lm_list[8]
-                        dx = thumb_tip[0] - index_tip[0]
-                        dy = thumb_tip[1] - index_tip[1]
-                        distance = np.sqrt(dx*dx + dy*dy)
-                        
-                        # Close pinch indicates zoom out
-                        zoom_level = max(zoom_level - zoom_change, min_zoom)
-                        last_gesture_time = current_time
-                        print(f"Zoom out: {zoom_level:.1f}x")
-
-                # Reset Zoom - Three finger pinch
-                if fingers == [1, 1, 1, 0, 0] and can_perform_gesture:
-                    zoom_level = 1.0
-                    last_gesture_time = current_time
-                    print("Zoom reset to 1.0x")
-
-                # Jump to first slide
-                if fingers == [0,1,0,0,1]:
-                    slide_num = 0
-                    annotations = [[]]
-                    annot_num = 0
-                    gest_done = True
-
-                # Jump to last slide
-                if fingers == [0,0,0,0,1]:
-                    slide_num = len(slide_images) - 1
-                    annotations = [[]]
-                    annot_num = 0
-                    gest_done = True
-
-            # Show Pointer
-            if fingers == [0, 1, 1, 0, 0]:
-                # Make pointer more visible with a larger circle and contrasting colors
-                cv2.circle(slide_current, index_fing, 5, (0, 0, 255), cv2.FILLED)  # Red fill
-                cv2.circle(slide_current, index_fing, 6, (0, 0, 0), 2)  # Black outline
-                
-                
-                annot_start = False
-
-            # Draw
-            if fingers == [0, 1, 0, 0, 0]:
-                # Process with cooldown for smoother performance
-                if not annot_start:
-                    annot_start = True
-                    annot_num += 1
-                    annotations.append([])
-
-                # Add point to annotation
-                annotations[annot_num].append(index_fing)
-                
-                # Draw more visible drawing point
-                cv2.circle(slide_current, index_fing, 4, (0, 0, 255), cv2.FILLED, cv2.LINE_AA)
-
+        # One table lookup per frame; the handlers above do the work
+        hand = hands[0] if hands else None
+        fingers = None
+        for action, smoother in pointer_smoothing.items():
+            smoothed = smoother(hands, frame_time)  # also forgets hands that are gone
+            if hand:
+                pointer_tips[action] = pointer_position(smoothed[0], width, height)
+        if hand:
+            if classifier is not None:
+                fingers = gesture_engine.label_codes(classifier.predict(hands))[0]
             else:
-                annot_start = False
-
-            # Erase
-            if fingers == [0, 1, 1, 1, 0] and can_perform_gesture:
-                if annotations and annot_num >= 0:
-                    if len(annotations) > 1:  # Make sure we have at least one annotation besides the initial empty one
-                        annotations.pop(-1)
-                        annot_num -= 1
-                        gest_done = True
-                        last_gesture_time = current_time
-
-        else:
+                fingers = detector.fingersUp(hand)
+        gesture_engine.dispatch(hand, fingers, frame_time, predicted=hands.predicted or repeated)
+        # A stroke continues while the draw pose stays confirmed, even across a misread frame
+        if gesture_engine.active is None or gesture_engine.active.name != "DRAW":
             annot_start = False
+        profiler.lap("gestures")
 
-        # Gesture Performed Iterations:
-        if gest_done:
-            gest_counter += 1
-            if gest_counter > delay:
-                gest_counter = 0
-                gest_done = False
-
-        # Draw Annotations with improved visual style
-        for annotation in annotations:
-            for j in range(1, len(annotation)):
-                # Draw smoother lines with anti-aliasing
-                cv2.line(slide_current, annotation[j - 1], annotation[j], (0, 0, 255), 4, cv2.LINE_AA)
-                
-                # Add shadow effect for depth
-                shadow_p1 = (annotation[j - 1][0] + 3, annotation[j - 1][1] + 3)
-                shadow_p2 = (annotation[j][0] + 3, annotation[j][1] + 3)
-                cv2.line(slide_current, shadow_p1, shadow_p2, (100, 100, 100), 4, cv2.LINE_AA)
+        # Draw Annotations: anti-aliased red strokes with a grey shadow for depth,
+        # already rasterized into the annotation layer as the points came in
+        annotation_store.composite(slide_current)
+        profiler.lap("annotations")
 
         # Adding Camera Image on Slide
         img_small = cv2.resize(frame, (ws, hs))
         h, w, _ = slide_current.shape
         slide_current[h - hs:h, w - ws:w] = img_small
+        profiler.lap("pip")
 
         # Add slide counter
         slide_text = f"Slide {slide_num + 1}/{len(slide_images)}"
         cv2.putText(slide_current, slide_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+        if export_job is not None and export_job.running:
+            cv2.putText(slide_current, export_job.status(), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 120, 0), 2)
+        if show_perf_hud:
+            profiler.draw_hud(slide_current)
+        profiler.lap("hud")
 
         cv2.imshow("Slides", slide_current)
 
         key = cv2.waitKey(1)
+        profiler.lap("imshow")
         if key == ord('q'):
             break
         elif key == 27:  # ESC key to toggle fullscreen
@@ -378,20 +401,19 @@ def main():
             file_path = file_manager.show_file_dialog()
             
             # Clear existing slides and annotations
+            if isinstance(slide_images, SlideDeck):
+                slide_images.close()
             slide_images = []
-            annotations = [[]]
-            annot_num = 0
+            annotation_store.reset()
             slide_num = 0
+            prefetched_slide = -1
             
             if file_path:
                 if file_path.lower().endswith(".pdf"):
                     try:
-                        doc = fitz.open(file_path)
-                        for page in doc:
-                            pix = page.get_pixmap()
-                            img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3)
-                            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                            slide_images.append(img)
+                        slide_images = SlideDeck.open(file_path, size=(width, height), disk_cache=disk_cache)
+                        if disk_cache is not None:
+                            slide_images.rasterize_all(processes=2)
                     except Exception as e:
                         print(f"Error loading PDF file: {e}")
                         blank = np.ones((height, width, 3), dtype=np.uint8) * 255
@@ -416,7 +438,33 @@ def main():
             cap = cv2.VideoCapture(0)
             cap.set(3, width)
             cap.set(4, height)
+            cap = CameraStream(cap).start()
         
+        elif key == ord('u'):  # u for undo
+            annot_start = False
+            annotation_store.undo()
+
+        elif key == ord('r'):  # r for redo
+            annot_start = False
+            annotation_store.redo()
+
+        elif key == ord('s'):  # s for save
+            if not isinstance(slide_images, SlideDeck):
+                print("Only PDF presentations can be exported")
+            elif export_job is not None and export_job.running:
+                print("An export is already running")
+            else:
+                annot_start = False
+                annotation_store.end_stroke()
+                out_path = file_manager.save_file_dialog(".pdf")
+                if out_path:
+                    # Strokes are copied now; the loop keeps running while the PDF is written
+                    export_job = PDFExportJob(slide_images.file_path, out_path, annotation_store.snapshot(),
+                                              (width, height)).start()
+
+        elif key == ord('p'):  # p for performance HUD
+            show_perf_hud = not show_perf_hud
+
         elif key == ord('h'):  # h for help
             # Display help
             help_img = np.ones((height, width, 3), dtype=np.uint8) * 255
@@ -434,6 +482,9 @@ def main():
                 "Thumb + Index far apart - Zoom In",
                 "Middle+ Ring + Pinky finger [0,0,1,1,1] - Zoom Out",
                 "Thumb + Index + Middle - Reset Zoom",
+                "Open palm outside the gesture area - Pan zoomed slide",
+                "Swipe left / right with an open hand - Next / Previous Slide",
+                "Circle with the hand - Reset Zoom",
                 "Index + Pinky finger - First Slide",
                 "Pinky finger - Last Slide"
                 "",
@@ -441,7 +492,10 @@ def main():
                 "ESC - Toggle fullscreen mode",
                 "Q - Quit application",
                 "O - Open file",
-                "H - Help dialog"
+                "H - Help dialog",
+                "U / R - Undo / redo annotation changes",
+                "S - Save annotated slides as PDF",
+                "P - Toggle latency HUD"
             ]
             
             for i, inst in enumerate(instructions):
@@ -456,8 +510,18 @@ def main():
             cv2.destroyWindow("Help")
 
     cap.release()
+    if export_job is not None:
+        export_job.join()
+    if async_detection:
+        detector.close()
+    if recorder is not None:
+        recorder.close()
+    if perf_log:
+        profiler.dump(perf_log)
     cv2.destroyAllWindows()
     print("Application closed")
 
 if __name__ == "__main__":
+    # Lets the spawned raster and detection workers start in a frozen (PyInstaller) build
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,178 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from landmarks import HandsResult, fingers_up
+
+
+def _detection_worker(shm_name, shape, n_slots, detector_kwargs, tasks, results):
+    """
+    Worker process entry point. Runs a HandDetector on frames written into
+    shared memory by the parent and sends back landmark results tagged with
+    the frame id they belong to.
+    """
+    # Import inside the worker so the parent never has to load mediapipe
+    from HandTracker import HandDetector
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((n_slots,) + tuple(shape), dtype=np.uint8, buffer=shm.buf)
+    detector = HandDetector(**detector_kwargs)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            frame_id, slot = task
+            hands = detector.findHands(frames[slot], draw_lm=False, draw_bbox=False)
+            results.put((frame_id, hands))
+    finally:
+        del frames
+        shm.close()
+
+
+class AsyncHandDetector:
+    """
+    Runs HandDetector in a separate process so MediaPipe inference does not
+    cap the frame rate of the render loop. Frames are passed through
+    multiprocessing.shared_memory instead of being pickled, and results
+    come back asynchronously with the id of the frame they were computed on.
+    The id and capture time of the newest result are kept in `result_id`
+    and `result_time`, so callers can tell a repeated or stale result from
+    a fresh one.
+    """
+
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, minTrackCon=0.5,
+                 roiTracking=False, n_slots=2):
+        """
+        :param mode: In static mode, detection is done on each image: slower
+        :param maxHands: Maximum number of hands to detect
+        :param detectionCon: Minimum Detection Confidence Threshold
+        :param minTrackCon: Minimum Tracking Confidence Threshold
+        :param roiTracking: Only process a crop around the previous frame's hands
+        :param n_slots: Number of frame slots in shared memory
+        """
+        self.detector_kwargs = dict(mode=mode, maxHands=maxHands,
+                                    detectionCon=detectionCon, minTrackCon=minTrackCon,
+                                    roiTracking=roiTracking)
+        self.n_slots = max(2, n_slots)
+        self.shape = None
+        self.shm = None
+        self.frames = None
+        self.process = None
+        self.task_queue = None
+        self.result_queue = None
+        self.in_flight = 0
+        self.next_slot = 0
+        self.frame_id = 0
+        self.result_id = -1        # frame id of the newest result, -1 before the first
+        self.result_time = None    # capture time of the frame the newest result belongs to
+        self.submit_times = {}     # frame id -> capture time of frames in flight
+        self.hands = HandsResult.empty()
+
+    def _start(self, shape):
+        """Allocate shared memory for frames of the given shape and spawn the worker."""
+        self.close()
+        self.shape = shape
+        nbytes = int(np.prod(shape)) * self.n_slots
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.frames = np.ndarray((self.n_slots,) + tuple(shape), dtype=np.uint8, buffer=self.shm.buf)
+        # Spawn instead of fork: forking a parent that already runs threads
+        # (camera reader, slide prefetch) can deadlock the child
+        context = mp.get_context("spawn")
+        self.task_queue = context.Queue()
+        self.result_queue = context.Queue()
+        self.process = context.Process(target=_detection_worker,
+                                  args=(self.shm.name, shape, self.n_slots,
+                                        self.detector_kwargs, self.task_queue, self.result_queue),
+                                  daemon=True)
+        self.process.start()
+        self.in_flight = 0
+        self.submit_times.clear()
+
+    def submit(self, img, timestamp=None):
+        """
+        Queue a BGR frame for detection. Frames are only accepted while the
+        worker is idle, so the worker always sees a recent frame instead of
+        working through a backlog.
+        :param img: Image to find the hands in
+        :param timestamp: Monotonic capture time of the image (default: now)
+        :return: Frame id assigned to the image, or None if it was skipped
+        """
+        if self.shape != img.shape:
+            self._start(img.shape)
+        self.poll()
+        if self.in_flight >= self.n_slots - 1:
+            return None
+
+        slot = self.next_slot
+        self.next_slot = (self.next_slot + 1) % self.n_slots
+        self.frames[slot] = img
+        self.frame_id += 1
+        self.submit_times[self.frame_id] = time.monotonic() if timestamp is None else timestamp
+        self.task_queue.put((self.frame_id, slot))
+        self.in_flight += 1
+        return self.frame_id
+
+    def poll(self):
+        """
+        Collect any finished results without blocking.
+        :return: Tuple of (frame id, hands) for the newest result received
+        :raises RuntimeError: If the worker process died
+        """
+        if self.result_queue is None:
+            return self.result_id, self.hands
+        while True:
+            try:
+                frame_id, hands = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.in_flight -= 1
+            captured = self.submit_times.pop(frame_id, None)
+            if frame_id > self.result_id:
+                self.result_id, self.result_time, self.hands = frame_id, captured, hands
+        if self.process is not None and not self.process.is_alive():
+            # Without this the last hands would be returned forever
+            exitcode = self.process.exitcode
+            self.close()
+            raise RuntimeError(f"Hand detection worker exited unexpectedly (exit code {exitcode})")
+        return self.result_id, self.hands
+
+    def findHands(self, img, timestamp=None):
+        """
+        Submit a frame and return the newest available result, which may
+        belong to an earlier frame. Check `result_id` and `result_time`
+        afterwards: an unchanged `result_id` means no new detection finished
+        and the same hands were returned again.
+        :param img: Image to find the hands in.
+        :param timestamp: Monotonic capture time of the image (default: now)
+        :return: Hands information from the most recent completed detection
+        :raises RuntimeError: If the worker process died
+        """
+        self.submit(img, timestamp)
+        return self.poll()[1]
+
+    def fingersUp(self, myHand):
+        """
+        Finds how many fingers are open and returns in a list.
+        Considers left and right hands separately
+        :return: List of which fingers are up
+        """
+        return fingers_up(myHand["lmList"], myHand["type"] == "Right")[0].tolist()
+
+    def close(self):
+        """Stop the worker process and free the shared memory."""
+        if self.process is not None:
+            self.task_queue.put(None)
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        if self.shm is not None:
+            self.frames = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+        self.shape = None
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Headless benchmarks for the non-ML parts of the frame loop. Needs no camera,
+no display and no MediaPipe: frames are synthetic, PDFs are generated on the
+fly and landmarks are synthetic or loaded from a recorded trace.
+
+Usage:
+    python benchmark.py                          # run and print results
+    python benchmark.py --save-baseline          # store results as the baseline
+                                                 # (per machine, not checked in)
+    python benchmark.py --baseline bench.json    # fail if slower than the baseline
+    python benchmark.py --trace traces/session1  # use recorded landmarks and
+                                                 # replay the session through the loop
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+
+from annotations import AnnotationLayer, Stroke
+from classifier import GestureClassifier
+from gestures import GestureEngine, GestureRecognizer, pointer_position
+from landmarks import HandsResult, fingers_code, fingers_up, hands_from_mediapipe
+from motion import MotionDetector
+
+DEFAULT_BASELINE = "bench_baseline.json"
+
+
+def time_it(fn, min_time=0.3, alloc_iters=20):
+    """
+    Time a function and measure how much memory it allocates per call.
+
+    Args:
+        fn: Callable taking no arguments
+        min_time: Minimum total seconds to run the timing loop for
+        alloc_iters: Number of calls traced with tracemalloc
+
+    Returns:
+        Dict with calls per second, microseconds per call and KB allocated per call
+    """
+    fn()  # warm up caches and lazy initialisation
+    iters = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while iters == 0 or elapsed < min_time:
+        fn()
+        iters += 1
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(alloc_iters):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        "fps": iters / elapsed,
+        "us": elapsed / iters * 1e6,
+        "alloc_kb": allocated / alloc_iters / 1024,
+    }
+
+
+def synthetic_hands(n, width=1280, height=720, seed=0):
+    """
+    Generate plausible hands: an open palm template with random offsets,
+    scale, per-finger curl and noise.
+
+    Returns:
+        Tuple of ((n, 21, 3) float32 landmarks in pixels, (n,) bool handedness)
+    """
+    rng = np.random.default_rng(seed)
+    template = np.array([
+        [0, 0], [-30, -20], [-50, -45], [-65, -70], [-75, -95],     # thumb
+        [-25, -90], [-28, -130], [-30, -155], [-32, -175],          # index
+        [0, -95], [0, -140], [0, -168], [0, -190],                  # middle
+        [22, -90], [25, -130], [27, -155], [28, -172],              # ring
+        [42, -80], [48, -110], [52, -130], [55, -145],              # pinky
+    ], dtype=np.float32)
+    hands = np.repeat(template[None], n, axis=0)
+    # Curl random fingers by pulling their two outer joints towards the wrist
+    for finger in range(5):
+        joints = [finger * 4 + 3, finger * 4 + 4]
+        curled = rng.random(n) < 0.5
+        hands[np.ix_(curled, joints)] *= np.float32(0.45)
+    hands *= rng.uniform(0.6, 1.4, (n, 1, 1)).astype(np.float32)
+    hands += rng.normal(0, 2, hands.shape).astype(np.float32)
+    hands += np.stack([rng.uniform(200, width - 200, n), rng.uniform(250, height - 50, n)], axis=1)[:, None].astype(np.float32)
+    z = rng.normal(0, 20, (n, 21, 1)).astype(np.float32)
+    return np.concatenate([hands, z], axis=2), rng.random(n) < 0.5
+
+
+def make_pdf(path, pages):
+    """Write a simple text PDF with the given number of pages."""
+    import fitz
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=960, height=540)
+        page.insert_text((72, 100), f"Benchmark slide {i + 1}", fontsize=40)
+        for j in range(6):
+            page.insert_text((90, 180 + j * 50), f"- bullet point {j + 1} on slide {i + 1}", fontsize=22)
+        page.draw_rect(fitz.Rect(600, 300, 900, 500), color=(0, 0, 1), fill=(0.8, 0.9, 1))
+    doc.save(path)
+    doc.close()
+
+
+def make_annotations(n_strokes, points_per_stroke, width, height, seed=0):
+    """Random-walk Strokes."""
+    rng = np.random.default_rng(seed)
+    annotations = []
+    for _ in range(n_strokes):
+        start = rng.uniform((0, 0), (width, height))
+        steps = rng.normal(0, 4, (points_per_stroke, 2)).cumsum(axis=0)
+        pts = np.clip(start + steps, 0, (width - 1, height - 1)).astype(int)
+        annotations.append(Stroke.from_points(pts))
+    return annotations
+
+
+def mediapipe_results(landmarks, handedness, width, height):
+    """Stand-in for a MediaPipe Hands result with the same attribute layout."""
+    normalized = landmarks.astype(np.float64) / (width, height, width)
+    return SimpleNamespace(
+        multi_hand_landmarks=[SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in hand])
+                              for hand in normalized.tolist()],
+        multi_handedness=[SimpleNamespace(classification=[SimpleNamespace(label="Left" if right else "Right")])
+                          for right in handedness.tolist()])
+
+
+def bench_detector(results, landmarks, handedness):
+    """HandDetector post-processing and finger state classification."""
+    width, height = 1280, 720
+    mp_results = mediapipe_results(landmarks[:1], handedness[:1], width, height)
+
+    def postprocess():
+        # The conversion findHands runs on every MediaPipe result
+        hands = hands_from_mediapipe(mp_results, width, height)
+        return hands[0]["center"]
+
+    results["detector.postprocess"] = time_it(postprocess)
+
+    hand = HandsResult(landmarks[:1], handedness[:1])[0]
+    results["fingersUp.single"] = time_it(lambda: fingers_up(hand["lmList"], hand["type"] == "Right"))
+    results["fingersUp.batch_10k"] = time_it(lambda: fingers_up(landmarks[:10000], handedness[:10000]))
+
+
+def bench_gestures(results, landmarks, handedness):
+    """GestureRecognizer over a stream of hands."""
+    hands = HandsResult(landmarks[:512], handedness[:512])
+    dicts = list(hands)
+    fingers = hands.fingersUp().tolist()
+    recognizer = GestureRecognizer(gesture_delay=0)
+    state = {"i": 0}
+
+    def recognize():
+        i = state["i"] = (state["i"] + 1) % len(dicts)
+        recognizer.recognize_gesture(dicts[i], fingers[i])
+        recognizer.get_pointer_position(dicts[i], 1280, 720)
+
+    results["gestures.recognize"] = time_it(recognize)
+
+    detector = MotionDetector()
+    state["t"] = 0.0
+
+    def motion():
+        i = state["i"] = (state["i"] + 1) % len(dicts)
+        state["t"] += 1 / 30
+        detector.update(dicts[i]["lmList"], state["t"])
+
+    results["gestures.motion"] = time_it(motion)
+
+    # Pose classifier trained to reproduce fingersUp, one frame with two hands
+    classifier = GestureClassifier("knn").fit(landmarks[:5000], handedness[:5000],
+                                              fingers_code(landmarks[:5000], handedness[:5000]))
+    pair = HandsResult(landmarks[:2], handedness[:2])
+    results["gestures.classify.2hands"] = time_it(lambda: classifier.predict(pair))
+
+
+def bench_annotations(results, width=1280, height=720):
+    """Live stroke drawing and layer rebuilds."""
+    rng = np.random.default_rng(0)
+    walk = np.clip(rng.normal(0, 4, (3000, 2)).cumsum(axis=0) + (width / 2, height / 2),
+                   0, (width - 1, height - 1)).astype(int).tolist()
+    layer = AnnotationLayer(width, height, shadow_color=(100, 100, 100))
+    state = {"i": 0, "stroke": Stroke()}
+
+    def draw_point():
+        i = state["i"] = (state["i"] + 1) % len(walk)
+        if i == 0:
+            state["stroke"] = Stroke()
+            layer.reset()
+        if state["stroke"].append(walk[i]):
+            layer.add_point(state["stroke"])
+
+    results["annotations.draw_point"] = time_it(draw_point)
+
+    strokes = make_annotations(50, 300, width, height)
+    results["annotations.rebuild.50x300"] = time_it(lambda: layer.rebuild(strokes))
+
+
+def bench_presentation(results, pages, resolutions, densities):
+    """PresentationController.load_file and render_frame."""
+    from presentation import PresentationController
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench.pdf")
+        make_pdf(pdf_path, pages)
+
+        def load():
+            # load_file reports progress on stdout; keep the benchmark output readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.load_file(pdf_path)
+                controller.render_frame(webcam, None, False)
+
+        webcam = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        controller = PresentationController()
+        results[f"load_file.{pages}p"] = time_it(load, min_time=0.5, alloc_iters=1)
+
+        for width, height in resolutions:
+            controller = PresentationController(width, height)
+            load()
+            hand_data = {"gesture_thresh_x": width // 2, "gesture_thresh_y": height // 3,
+                         "pointer_pos": (width // 3, height // 3)}
+            for n_strokes, n_points in densities:
+                controller.annotation_store.reset()
+                controller.annotation_store.extend(make_annotations(n_strokes, n_points, width, height))
+                name = f"render_frame.{width}x{height}.{n_strokes}x{n_points}"
+                results[name] = time_it(lambda: controller.render_frame(webcam, hand_data, True, "POINTER"))
+
+
+def bench_replay(results, trace, pages, render=True):
+    """
+    A recorded session through the frame loop: every frame of the trace, in
+    order and at its recorded capture time, is dispatched to a GestureEngine
+    with motion detection that drives a PresentationController, and is then
+    rendered. Prints how often each gesture fired.
+    """
+    from landmark_trace import TraceReplayer
+    from presentation import PresentationController
+
+    replayer = TraceReplayer(trace)
+    frames = list(replayer.play(speed=0))
+    height, width = replayer.shape[:2] if replayer.shape else (720, 1280)
+    webcam = np.zeros((height, width, 3), dtype=np.uint8)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench.pdf")
+        make_pdf(pdf_path, pages)
+
+        def replay(trace_alloc=False):
+            # A fresh session per pass, as the trace's timestamps start over
+            controller = PresentationController()
+            with contextlib.redirect_stdout(io.StringIO()):
+                controller.load_file(pdf_path)
+            engine = GestureEngine(motion=MotionDetector())
+            controller.register_gestures(engine)
+            fired = Counter()
+            allocated = 0
+            start = time.perf_counter()
+            for timestamp, hands in frames:
+                if trace_alloc:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                hand = hands[0] if hands else None
+                fingers = hands.fingersUp()[0].tolist() if hands else None
+                gesture = engine.dispatch(hand, fingers, timestamp, predicted=hands.predicted)
+                if engine.active is None or engine.active.name != "DRAW":
+                    controller.end_annotation()
+                if gesture is not None:
+                    fired[gesture.name] += 1
+                if render:
+                    hand_data = {"gesture_thresh_x": engine.gesture_threshold_x,
+                                 "gesture_thresh_y": engine.gesture_threshold_y,
+                                 "pointer_pos": pointer_position(hand, width, height)}
+                    controller.render_frame(webcam, hand_data, True, gesture and gesture.name)
+                if trace_alloc:
+                    allocated += tracemalloc.get_traced_memory()[1] - before
+            return time.perf_counter() - start, fired, allocated
+
+        elapsed, fired, _ = replay()
+        tracemalloc.start()
+        allocated = replay(trace_alloc=True)[2]
+        tracemalloc.stop()
+
+    n = max(len(frames), 1)
+    results["replay.frame"] = {"fps": n / elapsed, "us": elapsed / n * 1e6, "alloc_kb": allocated / n / 1024}
+    summary = ", ".join(f"{name} x{count}" for name, count in fired.most_common()) or "none"
+    print(f"Replayed {len(frames)} frames of {trace}; gestures fired: {summary}")
+
+
+def run_suite(args):
+    """Run all benchmarks and return the results keyed by benchmark name."""
+    if args.trace:
+        from landmark_trace import TraceReplayer
+        landmarks, handedness = TraceReplayer(args.trace).landmarks()
+        if len(landmarks) == 0:
+            sys.exit(f"Trace {args.trace} contains no hands")
+        reps = -(-10000 // len(landmarks))
+        landmarks = np.tile(landmarks, (reps, 1, 1))
+        handedness = np.tile(handedness, reps)
+    else:
+        landmarks, handedness = synthetic_hands(10000)
+
+    results = {}
+    bench_detector(results, landmarks, handedness)
+    bench_gestures(results, landmarks, handedness)
+    bench_annotations(results)
+    if not args.skip_render:
+        resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions]
+        densities = [tuple(int(v) for v in d.split("x")) for d in args.densities]
+        bench_presentation(results, args.pages, resolutions, densities)
+    if args.trace:
+        bench_replay(results, args.trace, args.pages, render=not args.skip_render)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline.
+
+    Returns:
+        List of (name, baseline fps, current fps) for benchmarks that got
+        slower by more than `tolerance`
+    """
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        old_fps = baseline[name]["fps"]
+        if stats["fps"] < old_fps * (1 - tolerance):
+            regressions.append((name, old_fps, stats["fps"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless hot-loop benchmarks")
+    parser.add_argument("--trace", help="Landmark trace directory to use instead of synthetic hands, "
+                                        "also replayed through the gesture engine and renderer")
+    parser.add_argument("--pages", type=int, default=50, help="Pages in the generated PDF")
+    parser.add_argument("--resolutions", nargs="+", default=["1280x720", "1920x1080"])
+    parser.add_argument("--densities", nargs="+", default=["0x0", "10x100", "50x300"],
+                        help="Annotation densities as STROKESxPOINTS")
+    parser.add_argument("--skip-render", action="store_true", help="Skip PDF loading and rendering")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before failing")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        # Timings are machine specific, so no baseline is checked in
+        print(f"No baseline at {args.baseline}; run with --save-baseline on this machine to create one")
+
+    print(f"{'benchmark':<40}{'fps':>12}{'us/call':>12}{'KB/call':>10}{'vs base':>10}")
+    for name, stats in results.items():
+        change = ""
+        if name in baseline:
+            change = f"{stats['fps'] / baseline[name]['fps'] - 1:+.0%}"
+        print(f"{name:<40}{stats['fps']:12.1f}{stats['us']:12.1f}{stats['alloc_kb']:10.1f}{change:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, old_fps, new_fps in regressions:
+        print(f"REGRESSION {name}: {old_fps:.1f} -> {new_fps:.1f} fps")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
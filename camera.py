@@ -0,0 +1,117 @@
+import threading
+import time
+
+
+class CameraStream:
+    """
+    Reads webcam frames on a background thread into a small preallocated
+    ring buffer and hands the consumer only the newest frame. Frames the
+    consumer never picked up are counted as dropped, so latency depends on
+    processing time instead of on the depth of the driver's queue.
+    """
+
+    def __init__(self, cap, buffer_size=3):
+        """
+        Args:
+            cap: An opened cv2.VideoCapture. The stream takes ownership of it.
+            buffer_size: Number of ring buffer slots (at least 3, so the
+                producer never overwrites the slot the consumer is holding)
+        """
+        self.cap = cap
+        self.buffer_size = max(3, buffer_size)
+        self.slots = [None] * self.buffer_size
+        self.times = [0.0] * self.buffer_size  # monotonic capture time of each slot
+        self.frame_time = None     # capture time of the frame last returned by read()
+        self.frame_id = 0          # id of the newest frame written by the producer
+        self.read_id = 0           # id of the last frame handed to the consumer
+        self.dropped = 0           # frames overwritten before the consumer read them
+        self.latest_slot = -1
+        self.held_slot = -1
+        self.running = False
+        self.failed = False
+        self.thread = None
+        self.cond = threading.Condition()
+
+    def start(self):
+        """Start the capture thread."""
+        if self.running:
+            return self
+        self.running = True
+        self.failed = False
+        self.thread = threading.Thread(target=self._update, name="CameraStream", daemon=True)
+        self.thread.start()
+        return self
+
+    def _next_slot(self):
+        """Pick a slot that is neither the newest frame nor held by the consumer."""
+        for offset in range(1, self.buffer_size + 1):
+            slot = (self.latest_slot + offset) % self.buffer_size
+            if slot != self.latest_slot and slot != self.held_slot:
+                return slot
+        return 0
+
+    def _update(self):
+        """Capture loop running on the background thread."""
+        while self.running:
+            with self.cond:
+                slot = self._next_slot()
+            success, img = self.cap.read(self.slots[slot])
+            captured = time.monotonic()
+            if not success:
+                with self.cond:
+                    self.failed = True
+                    self.running = False
+                    self.cond.notify_all()
+                break
+
+            with self.cond:
+                # read() may have reallocated if the frame size changed
+                self.slots[slot] = img
+                self.times[slot] = captured
+                if self.frame_id > self.read_id:
+                    self.dropped += 1
+                self.latest_slot = slot
+                self.frame_id += 1
+                self.cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Get the newest captured frame, waiting for one that has not been
+        returned before.
+
+        The returned array lives in the ring buffer and stays valid until the
+        next call to read(); copy it if it must outlive that. Its monotonic
+        capture time is available as `frame_time` until then.
+
+        Args:
+            timeout: Seconds to wait for a new frame
+
+        Returns:
+            Tuple of (success, frame)
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.frame_id == self.read_id:
+                remaining = deadline - time.monotonic()
+                if self.failed or not self.running or remaining <= 0:
+                    return False, None
+                self.cond.wait(remaining)
+            self.held_slot = self.latest_slot
+            self.read_id = self.frame_id
+            self.frame_time = self.times[self.held_slot]
+            return True, self.slots[self.held_slot]
+
+    def set(self, prop_id, value):
+        """Forward a property change to the underlying capture."""
+        return self.cap.set(prop_id, value)
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        """Stop the capture thread and release the camera."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.cap.release()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Learned hand pose classifier, an optional replacement for the hand-tuned
+fingersUp rules. Landmarks are normalized into a hand-centred frame, so
+the features don't change when the hand moves, turns or comes closer, and
+a small pure-NumPy model (k-nearest neighbours or a linear softmax model)
+maps them to gesture labels for all hands of a frame in one call.
+
+Training data are landmark traces recorded with landmark_trace.TraceRecorder,
+one trace per label, each holding the pose from different angles:
+
+    python classifier.py -o gestures.npz --trace NEXT_SLIDE=traces/next \
+        --trace PREV_SLIDE=traces/prev --trace NONE=traces/idle
+
+Labels are gesture names of the GestureEngine table; any other label (like
+NONE above) stands for "no gesture".
+"""
+import argparse
+import json
+
+import numpy as np
+
+
+def landmark_features(landmarks, handedness):
+    """
+    Normalized, rotation-invariant features for any number of hands.
+
+    Landmarks are taken relative to the wrist, rotated so that the wrist to
+    middle finger base axis points up, scaled by the length of that axis,
+    and left hands are mirrored onto right hands.
+
+    Args:
+        landmarks: (21, 3) landmarks of one hand or (N, 21, 3) for N hands, in pixels
+        handedness: True for right hands, scalar or one per hand
+
+    Returns:
+        (N, 60) float32 array: x, y and z of landmarks 1-20 in the hand frame
+    """
+    lm = np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+    right = np.asarray(handedness, dtype=bool).reshape(-1)
+    rel = lm[:, 1:] - lm[:, :1]
+    axis = rel[:, 8, :2]  # wrist -> middle finger base (landmark 9)
+    scale = np.maximum(np.hypot(axis[:, 0], axis[:, 1]), 1.0)[:, None]
+    ux, uy = axis[:, 0:1] / scale, axis[:, 1:2] / scale
+    x, y, z = rel[..., 0], rel[..., 1], rel[..., 2]
+    # Project onto the hand's right (-uy, ux) and down (-ux, -uy) directions
+    hand_x = (ux * y - uy * x) / scale
+    hand_y = (ux * x + uy * y) / -scale
+    hand_x = np.where(right[:, None], hand_x, -hand_x)
+    return np.concatenate([hand_x, hand_y, z / scale], axis=1)
+
+
+class KNNModel:
+    """
+    k-nearest neighbours over the training features. Distances to all
+    training samples come from one matrix product, so inference is fast for
+    the few thousand samples a handful of short traces yield.
+    """
+
+    def __init__(self, k=5, max_samples=4000, seed=0):
+        """
+        Args:
+            k: Number of neighbours that vote
+            max_samples: Training samples kept per label (randomly chosen)
+            seed: Seed for choosing the kept samples
+        """
+        self.k = k
+        self.max_samples = max_samples
+        self.seed = seed
+
+    def fit(self, features, targets, n_classes):
+        rng = np.random.default_rng(self.seed)
+        keep = []
+        for c in range(n_classes):
+            idx = np.flatnonzero(targets == c)
+            if len(idx) > self.max_samples:
+                idx = rng.choice(idx, self.max_samples, replace=False)
+            keep.append(idx)
+        keep = np.concatenate(keep)
+        self.load_state({"samples": features[keep], "targets": targets[keep], "n_classes": n_classes})
+        return self
+
+    def predict_proba(self, features):
+        # |a - b|^2 = |a|^2 - 2ab + |b|^2; |a|^2 is the same for every sample, so skip it
+        dist = self.sample_norms - 2 * features @ self.samples_t
+        k = min(self.k, dist.shape[1])
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        votes = self.targets[nearest]
+        proba = np.zeros((len(features), self.n_classes), dtype=np.float32)
+        np.add.at(proba, (np.arange(len(features))[:, None], votes), 1 / k)
+        return proba
+
+    def state(self):
+        return {"samples": self.samples_t.T, "targets": self.targets, "n_classes": np.int32(self.n_classes)}
+
+    def load_state(self, state):
+        samples = np.asarray(state["samples"], dtype=np.float32)
+        # Stored transposed: the matrix product with a few hands is several times faster
+        self.samples_t = np.ascontiguousarray(samples.T)
+        self.sample_norms = (samples ** 2).sum(axis=1)
+        self.targets = np.asarray(state["targets"], dtype=np.int32)
+        self.n_classes = int(state["n_classes"])
+
+
+class LinearModel:
+    """
+    Multinomial logistic regression on standardized features, trained by
+    full-batch gradient descent. Inference is a single matrix product.
+    """
+
+    def __init__(self, epochs=500, learning_rate=0.5, l2=1e-4):
+        """
+        Args:
+            epochs: Gradient descent steps
+            learning_rate: Step size
+            l2: Weight decay
+        """
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+
+    def fit(self, features, targets, n_classes):
+        self.mean = features.mean(axis=0)
+        self.std = features.std(axis=0) + 1e-6
+        x = (features - self.mean) / self.std
+        onehot = np.eye(n_classes, dtype=np.float32)[targets]
+        self.weights = np.zeros((x.shape[1], n_classes), dtype=np.float32)
+        self.bias = np.zeros(n_classes, dtype=np.float32)
+        for _ in range(self.epochs):
+            error = (self._softmax(x @ self.weights + self.bias) - onehot) / len(x)
+            self.weights -= self.learning_rate * (x.T @ error + self.l2 * self.weights)
+            self.bias -= self.learning_rate * error.sum(axis=0)
+        return self
+
+    @staticmethod
+    def _softmax(logits):
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, features):
+        return self._softmax(((features - self.mean) / self.std) @ self.weights + self.bias)
+
+    def state(self):
+        return {"mean": self.mean, "std": self.std, "weights": self.weights, "bias": self.bias}
+
+    def load_state(self, state):
+        self.mean = state["mean"]
+        self.std = state["std"]
+        self.weights = state["weights"]
+        self.bias = state["bias"]
+
+
+MODELS = {"knn": KNNModel, "linear": LinearModel}
+
+
+class GestureClassifier:
+    """
+    Predicts gesture labels for hands from their normalized landmarks.
+    Predictions below `min_confidence` are reported as None.
+    """
+
+    def __init__(self, method="knn", min_confidence=0.6, **params):
+        """
+        Args:
+            method: "knn" or "linear"
+            min_confidence: Minimum class probability for a prediction
+            **params: Model parameters, see KNNModel and LinearModel
+        """
+        if method not in MODELS:
+            raise ValueError(f"Unknown classifier method {method!r}, expected one of {sorted(MODELS)}")
+        self.method = method
+        self.min_confidence = min_confidence
+        self.params = params
+        self.model = MODELS[method](**params)
+        self.labels = None
+
+    def fit(self, landmarks, handedness, labels):
+        """
+        Train on labelled hands.
+
+        Args:
+            landmarks: (N, 21, 3) landmarks in pixels
+            handedness: (N,) bool, True for right hands
+            labels: (N,) labels, e.g. gesture names
+
+        Returns:
+            self
+        """
+        self.labels, targets = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        self.model.fit(landmark_features(landmarks, handedness), targets, len(self.labels))
+        return self
+
+    @classmethod
+    def from_traces(cls, traces, method="knn", **kwargs):
+        """
+        Train on recorded landmark traces.
+
+        Args:
+            traces: Dict of label -> trace directory or list of directories
+            method, **kwargs: See GestureClassifier
+
+        Returns:
+            The trained GestureClassifier
+        """
+        from landmark_trace import TraceReplayer
+
+        landmarks, handedness, labels = [], [], []
+        for label, paths in traces.items():
+            for path in [paths] if isinstance(paths, str) else paths:
+                lm, hd = TraceReplayer(path).landmarks()
+                landmarks.append(lm)
+                handedness.append(hd)
+                labels.append(np.full(len(lm), label))
+        return cls(method, **kwargs).fit(np.concatenate(landmarks), np.concatenate(handedness),
+                                         np.concatenate(labels))
+
+    def predict_proba(self, landmarks, handedness):
+        """
+        Class probabilities for any number of hands.
+
+        Returns:
+            (N, len(labels)) array, columns in the order of self.labels
+        """
+        return self.model.predict_proba(landmark_features(landmarks, handedness))
+
+    def predict(self, hands):
+        """
+        Gesture labels of all hands in a frame, in one batch.
+
+        Args:
+            hands: HandsResult from the detector
+
+        Returns:
+            List with a label or None per hand
+        """
+        if not hands:
+            return []
+        proba = self.predict_proba(hands.landmarks, hands.handedness)
+        best = proba.argmax(axis=1)
+        confident = proba[np.arange(len(best)), best] >= self.min_confidence
+        return [str(self.labels[b]) if ok else None for b, ok in zip(best.tolist(), confident.tolist())]
+
+    def save(self, path):
+        """Store the trained classifier in a .npz file."""
+        meta = {"method": self.method, "min_confidence": self.min_confidence, "params": self.params}
+        np.savez(path, meta=json.dumps(meta), labels=self.labels, **self.model.state())
+
+    @classmethod
+    def load(cls, path):
+        """Load a classifier stored with save()."""
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            classifier = cls(meta["method"], meta["min_confidence"], **meta["params"])
+            classifier.labels = data["labels"]
+            classifier.model.load_state({key: data[key] for key in data.files})
+        return classifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a hand pose classifier from landmark traces")
+    parser.add_argument("--trace", action="append", required=True, metavar="LABEL=DIR",
+                        help="Trace directory holding one pose, may be repeated")
+    parser.add_argument("-o", "--output", default="gestures.npz", help="Classifier file to write")
+    parser.add_argument("--method", choices=sorted(MODELS), default="knn")
+    parser.add_argument("--min-confidence", type=float, default=0.6)
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Fraction of every trace kept back to report the accuracy")
+    args = parser.parse_args()
+
+    traces = {}
+    for spec in args.trace:
+        label, _, path = spec.partition("=")
+        traces.setdefault(label, []).append(path)
+
+    if args.holdout > 0:
+        from landmark_trace import TraceReplayer
+
+        train, test = ([], [], []), ([], [], [])
+        for label, paths in traces.items():
+            for path in paths:
+                lm, hd = TraceReplayer(path).landmarks()
+                # Hold back the end of each trace; neighbouring frames are near duplicates
+                split = int(len(lm) * (1 - args.holdout))
+                for part, sl in ((train, slice(None, split)), (test, slice(split, None))):
+                    part[0].append(lm[sl])
+                    part[1].append(hd[sl])
+                    part[2].append(np.full(len(lm[sl]), label))
+        train, test = [[np.concatenate(a) for a in part] for part in (train, test)]
+        classifier = GestureClassifier(args.method, args.min_confidence).fit(*train)
+        predicted = classifier.labels[classifier.predict_proba(test[0], test[1]).argmax(axis=1)]
+        print(f"Holdout accuracy: {np.mean(predicted == test[2]):.1%} on {len(predicted)} hands")
+
+    classifier = GestureClassifier.from_traces(traces, args.method, min_confidence=args.min_confidence)
+    classifier.save(args.output)
+    print(f"Saved classifier with labels {', '.join(classifier.labels)} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import math
+import time
+
+import numpy as np
+
+from landmarks import HandsResult
+
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al.) applied element-wise to an array of any
+    shape, e.g. all 21x3 landmark coordinates of a hand at once. The cutoff
+    frequency rises with speed: slow movements are smoothed strongly, fast
+    ones pass with little lag.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0, max_gap=0.5):
+        """
+        Args:
+            min_cutoff: Cutoff frequency in Hz at rest; lower is smoother
+            beta: Cutoff increase per unit of speed (pixels per second); higher lags less
+            d_cutoff: Cutoff frequency in Hz of the speed estimate
+            max_gap: Seconds without samples after which the filter restarts
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state."""
+        self.x = None
+        self.dx = None
+        self.timestamp = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        return 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+
+    def __call__(self, x, timestamp=None):
+        """
+        Filter one sample.
+
+        Args:
+            x: Array of raw values
+            timestamp: Monotonic time of the sample in seconds (default: now)
+
+        Returns:
+            New array of filtered values
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        x = np.asarray(x, dtype=np.float32)
+        if (self.x is None or self.x.shape != x.shape or now <= self.timestamp
+                or now - self.timestamp > self.max_gap):
+            self.x = x.copy()
+            self.dx = np.zeros_like(x)
+            self.timestamp = now
+            return self.x.copy()
+
+        dt = now - self.timestamp
+        self.timestamp = now
+        dx = (x - self.x) / dt
+        self.dx += self._alpha(self.d_cutoff, dt) * (dx - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        self.x += self._alpha(cutoff, dt) * (x - self.x)
+        return self.x.copy()
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter applied independently to every element
+    of an array. Each coordinate has a position/velocity state with its own
+    2x2 covariance, kept as three arrays so the predict and update steps are
+    a handful of element-wise operations for all coordinates together.
+    """
+
+    def __init__(self, process_noise=5e4, measurement_noise=4.0, max_gap=0.5):
+        """
+        Args:
+            process_noise: Acceleration noise density in pixels^2/s^3; higher
+                follows direction changes faster, lower smooths more
+            measurement_noise: Variance of the raw measurements in pixels^2
+            max_gap: Seconds without samples after which the filter restarts
+        """
+        self.q = process_noise
+        self.r = measurement_noise
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state."""
+        self.x = None
+        self.v = None
+        self.timestamp = None
+
+    def __call__(self, z, timestamp=None):
+        """
+        Filter one measurement.
+
+        Args:
+            z: Array of measured values
+            timestamp: Monotonic time of the measurement in seconds (default: now)
+
+        Returns:
+            New array of filtered values
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        z = np.asarray(z, dtype=np.float32)
+        if (self.x is None or self.x.shape != z.shape or now <= self.timestamp
+                or now - self.timestamp > self.max_gap):
+            self.x = z.copy()
+            self.v = np.zeros_like(z)
+            # Position known to measurement accuracy, velocity unknown
+            self.p00 = np.full_like(z, self.r)
+            self.p01 = np.zeros_like(z)
+            self.p11 = np.full_like(z, 1e6)
+            self.timestamp = now
+            return self.x.copy()
+
+        dt = now - self.timestamp
+        self.timestamp = now
+        # Predict
+        self.x += self.v * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + self.q * dt ** 3 / 3
+        self.p01 += dt * self.p11 + self.q * dt ** 2 / 2
+        self.p11 += self.q * dt
+        # Update
+        s = self.p00 + self.r
+        k0 = self.p00 / s
+        k1 = self.p01 / s
+        innovation = z - self.x
+        self.x += k0 * innovation
+        self.v += k1 * innovation
+        self.p11 -= k1 * self.p01
+        self.p00 *= 1 - k0
+        self.p01 *= 1 - k0
+        return self.x.copy()
+
+
+FILTERS = {"one_euro": OneEuroFilter, "kalman": KalmanFilter}
+
+
+class HandSmoother:
+    """
+    Smooths the landmarks of every detected hand. Each hand (told apart by
+    handedness) gets its own filter running over all 21x3 coordinates at
+    once; a hand that disappears has its filter dropped.
+    """
+
+    def __init__(self, method="one_euro", **params):
+        """
+        Args:
+            method: "one_euro" or "kalman"
+            **params: Filter parameters, see OneEuroFilter and KalmanFilter
+        """
+        if method not in FILTERS:
+            raise ValueError(f"Unknown smoothing method {method!r}, expected one of {sorted(FILTERS)}")
+        self.method = method
+        self.params = params
+        self.filters = {}  # handedness -> filter
+
+    def __call__(self, hands, timestamp=None):
+        """
+        Smooth a detection result.
+
+        Args:
+            hands: HandsResult from the detector
+            timestamp: Monotonic capture time in seconds (default: now)
+
+        Returns:
+            A new HandsResult with smoothed landmarks
+        """
+        if not hands:
+            self.filters.clear()
+            return hands
+        now = time.monotonic() if timestamp is None else timestamp
+        landmarks = np.empty_like(hands.landmarks)
+        seen = set()
+        for i, right in enumerate(hands.handedness.tolist()):
+            if right in seen:
+                # Two hands with the same handedness can't be told apart; pass through
+                landmarks[i] = hands.landmarks[i]
+                continue
+            seen.add(right)
+            smoother = self.filters.get(right)
+            if smoother is None:
+                smoother = self.filters[right] = FILTERS[self.method](**self.params)
+            landmarks[i] = smoother(hands.landmarks[i], now)
+        for right in list(self.filters):
+            if right not in seen:
+                del self.filters[right]
+        return HandsResult(landmarks, hands.handedness, shape=hands.shape, predicted=hands.predicted)
+
+    def reset(self):
+        """Forget all hands."""
+        self.filters.clear()
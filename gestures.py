@@ -1,125 +1,576 @@
+import math
+import time
+from collections import deque
+
 import numpy as np
 
-class GestureRecognizer:
+from motion import SWIPE_LEFT, SWIPE_RIGHT, CIRCLE_CW, CIRCLE_CCW
+
+# Where on screen a gesture is accepted, relative to the gesture area in the
+# upper right corner of the camera image
+IN_AREA = "in_area"
+OUTSIDE_AREA = "outside_area"
+ANYWHERE = "anywhere"
+
+
+def thumb_index_apart(hand, min_distance=100):
+    """True if the thumb and index finger tips are more than min_distance pixels apart."""
+    thumb_tip, index_tip = hand["lmList"][4], hand["lmList"][8]
+    return math.hypot(thumb_tip[0] - index_tip[0], thumb_tip[1] - index_tip[1]) > min_distance
+
+
+# The gesture table shared by apk.py, GestureRecognizer and PresentationController:
+# name, fingers [thumb, index, middle, ring, pinky], area, confirm, hold, repeat
+# and optionally a condition(hand) that must also hold for the gesture to press.
+# confirm (k, m): the pose must be seen in k of the last m frames.
+# hold: seconds the confirmed pose must be held before the gesture fires.
+# repeat: None fires once per press (the pose must be released first),
+# a number of seconds fires again at that interval while held, 0 every frame.
+DEFAULT_GESTURES = [
+    ("PREV_SLIDE", [1, 0, 0, 0, 0], IN_AREA, (3, 5), 0.0, None),
+    ("NEXT_SLIDE", [0, 1, 1, 1, 1], IN_AREA, (3, 5), 0.0, None),
+    ("CLEAR_ANNOTATIONS", [1, 1, 1, 1, 1], IN_AREA, (4, 6), 0.2, None),
+    ("ZOOM_IN", [1, 1, 0, 0, 0], IN_AREA, (3, 5), 0.0, 0.3, thumb_index_apart),
+    ("ZOOM_OUT", [0, 0, 1, 1, 1], IN_AREA, (3, 5), 0.0, 0.3),
+    ("RESET_ZOOM", [1, 1, 1, 0, 0], IN_AREA, (3, 5), 0.0, None),
+    ("FIRST_SLIDE", [0, 1, 0, 0, 1], IN_AREA, (3, 5), 0.0, None),
+    ("LAST_SLIDE", [0, 0, 0, 0, 1], IN_AREA, (3, 5), 0.0, None),
+    ("PAN", [1, 1, 1, 1, 1], OUTSIDE_AREA, (2, 3), 0.0, 0),
+    ("POINTER", [0, 1, 1, 0, 0], ANYWHERE, (1, 1), 0.0, 0),
+    ("DRAW", [0, 1, 0, 0, 0], ANYWHERE, (2, 3), 0.0, 0),
+    ("ERASE", [0, 1, 1, 1, 0], ANYWHERE, (3, 5), 0.0, None),
+]
+
+# Poses of an open hand, with or without the thumb
+OPEN_HAND = [[0, 1, 1, 1, 1], [1, 1, 1, 1, 1]]
+
+# The dynamic gestures registered with a motion.MotionDetector: name, the
+# poses the hand may show when the motion completes (None for any) and area.
+# Swipes need an open hand, so reaching for the gesture area or moving while
+# pointing is not taken for a swipe.
+DEFAULT_MOTIONS = [
+    (SWIPE_LEFT, OPEN_HAND, ANYWHERE),
+    (SWIPE_RIGHT, OPEN_HAND, ANYWHERE),
+    (CIRCLE_CW, None, ANYWHERE),
+    (CIRCLE_CCW, None, ANYWHERE),
+]
+
+
+def finger_code(fingers):
     """
-    Recognizes hand gestures for controlling the presentation.
+    Pack a finger list into its 5-bit code, thumb as the most significant bit
+    (same layout as landmarks.pack_fingers, without the NumPy overhead for
+    a single hand).
+
+    Args:
+        fingers: Finger list [thumb, index, middle, ring, pinky] or an int code
+
+    Returns:
+        The code, 0-31
+    """
+    if isinstance(fingers, (int, np.integer)):
+        return int(fingers)
+    code = 0
+    for finger in fingers:
+        code = code * 2 + (1 if finger else 0)
+    return code
+
+
+def pointer_position(hand, width, height):
+    """
+    Map the index finger tip from the right half of the camera image to the
+    whole screen.
+
+    Args:
+        hand: Hand dictionary from HandDetector
+        width: Width of the frame
+        height: Height of the frame
+
+    Returns:
+        The (x, y) position of the pointer on the screen, or None
+    """
+    if not hand:
+        return None
+    lm_list = hand["lmList"]
+    if lm_list is None or len(lm_list) < 9:
+        return None
+    x_val = int(np.interp(lm_list[8][0], [width // 2, width], [0, width]))
+    y_val = int(np.interp(lm_list[8][1], [150, height - 150], [0, height]))
+    return (x_val, y_val)
+
+
+class Gesture:
+    """
+    One entry of a GestureEngine table.
     """
-    
-    def __init__(self, gesture_threshold_x=650, gesture_threshold_y=300, 
-                gesture_delay=15):
+
+    def __init__(self, name, code, handler=None, area=IN_AREA, confirm=(3, 5), hold=0.0, repeat=None,
+                 cooldown=None, condition=None, poses=None):
+        """
+        Args:
+            name: Action name, e.g. "NEXT_SLIDE"
+            code: 5-bit finger code, see finger_code, or None for a motion
+                gesture reported by a motion.MotionDetector
+            handler: Optional callable(hand) run when the gesture fires;
+                returning False means the action did not apply (e.g. no next
+                slide), so it is retried on the next frame
+            area: IN_AREA, OUTSIDE_AREA or ANYWHERE
+            confirm: (k, m), fire only once the pose was seen in k of the last m frames
+            hold: Seconds the pose must be held before the first firing
+            repeat: None to fire once per press, seconds between firings while
+                held, or 0 to fire on every frame
+            cooldown: Minimum seconds since the last gesture fired before
+                this one may fire, None for the engine's default. Does not
+                apply to continuous gestures.
+            condition: Optional callable(hand) that must return True on a
+                frame for the gesture to be pressed, for rules the finger
+                state can't express (e.g. thumb_index_apart)
+            poses: Motion gestures only: set of finger codes the hand may
+                show when the motion completes, None for any pose
+        """
+        self.name = name
+        self.code = code
+        self.handler = handler
+        self.area = area
+        self.confirm = confirm
+        self.hold = hold
+        self.repeat = repeat
+        self.cooldown = cooldown
+        self.condition = condition
+        self.poses = poses
+
+    @property
+    def continuous(self):
+        """True for gestures that act on every frame, like drawing or pointing."""
+        return self.repeat == 0
+
+
+class GestureEngine:
+    """
+    Table-driven gesture dispatch with a small state machine over time.
+
+    The finger state is packed into a 5-bit code that indexes a 32-entry
+    table, so finding the candidates for a hand is a single list lookup.
+    A candidate is only pressed once its pose was seen in k of the last m
+    frames (newer than `window` seconds), so a single misclassified frame
+    can neither fire a gesture nor release one. A pressed gesture fires after
+    its hold time and then, depending on `repeat`, once per press, at a fixed
+    interval or on every frame, until it is released. All timing uses
+    monotonic timestamps, so behaviour does not depend on the frame rate.
+
+    With a motion.MotionDetector, dynamic gestures (swipes, circles) are
+    detected from the hand's trajectory next to the static poses. They are
+    registered under the detector's motion names (see DEFAULT_MOTIONS) and
+    fire once per movement made in their pose and area, except while a
+    continuous gesture is acting.
+    """
+
+    def __init__(self, gesture_threshold_x=650, gesture_threshold_y=300, cooldown=0.15, window=0.5,
+                 gestures=DEFAULT_GESTURES, clock=time.monotonic, motion=None, motions=DEFAULT_MOTIONS):
         """
-        Initialize the gesture recognizer with thresholds.
-        
         Args:
             gesture_threshold_x: X-coordinate threshold for gesture detection area
             gesture_threshold_y: Y-coordinate threshold for gesture detection area
-            gesture_delay: Delay frames between gesture detection to prevent repeated triggers
+            cooldown: Default minimum seconds between two non-continuous gestures
+            window: Frames older than this many seconds don't count towards confirmation
+            gestures: Initial table as (name, fingers, area, confirm, hold, repeat[, condition]) tuples
+            clock: Monotonic time source in seconds, used when dispatch gets no timestamp
+            motion: Optional motion.MotionDetector for dynamic gestures
+            motions: Dynamic gestures registered with a motion detector as
+                (name, poses, area) tuples
         """
         self.gesture_threshold_x = gesture_threshold_x
         self.gesture_threshold_y = gesture_threshold_y
-        self.gesture_delay = gesture_delay
-        self.gesture_cooldown = 0
-        self.gesture_active = False
-        
+        self.cooldown = cooldown
+        self.window = window
+        self.clock = clock
+        self.table = [[] for _ in range(32)]  # finger code -> gestures
+        self.gestures = {}  # name -> Gesture
+        self.history = deque(maxlen=1)  # (timestamp, finger code or -1 without a hand)
+        self.active = None        # gesture currently pressed
+        self.pressed_at = 0.0     # when the active gesture was confirmed
+        self.fired_at = None      # when the active gesture last fired, None if not yet
+        self.last_trigger = float("-inf")  # when a non-continuous gesture last fired
+        for name, fingers, area, confirm, hold, repeat, *condition in gestures:
+            self.register(name, fingers, area=area, confirm=confirm, hold=hold, repeat=repeat,
+                          condition=condition[0] if condition else None)
+        self.motion = motion
+        if motion is not None:
+            for name, poses, area in motions:
+                self.register_motion(name, poses=poses, area=area)
+
+    def register(self, name, fingers, handler=None, area=IN_AREA, confirm=(3, 5), hold=0.0, repeat=None,
+                 cooldown=None, condition=None):
+        """
+        Add a gesture, replacing any gesture of the same name. Gestures that
+        share a finger state are tried in registration order.
+
+        Args:
+            name: Action name
+            fingers: Finger list or 5-bit code
+            handler, area, confirm, hold, repeat, cooldown, condition: See Gesture
+
+        Returns:
+            The Gesture
+        """
+        self.unregister(name)
+        gesture = Gesture(name, finger_code(fingers), handler, area, confirm, hold, repeat, cooldown,
+                          condition)
+        self.table[gesture.code].append(gesture)
+        self.gestures[name] = gesture
+        self._resize_history()
+        return gesture
+
+    def register_motion(self, name, handler=None, cooldown=None, poses=None, area=ANYWHERE):
+        """
+        Add a dynamic gesture, replacing any gesture of the same name. It
+        fires when the motion detector reports `name` while the hand is in
+        one of `poses` and in `area`.
+
+        Args:
+            name: Motion name, e.g. motion.SWIPE_LEFT
+            handler, cooldown: See Gesture
+            poses: Finger lists or codes the hand may show, None for any pose
+            area: IN_AREA, OUTSIDE_AREA or ANYWHERE
+
+        Returns:
+            The Gesture
+        """
+        self.unregister(name)
+        if poses is not None:
+            poses = {finger_code(fingers) for fingers in poses}
+        gesture = Gesture(name, None, handler, area, (1, 1), cooldown=cooldown, poses=poses)
+        self.gestures[name] = gesture
+        self._resize_history()
+        return gesture
+
+    def _resize_history(self):
+        longest = max(g.confirm[1] for g in self.gestures.values())
+        if longest != self.history.maxlen:
+            self.history = deque(self.history, maxlen=longest)
+
+    def unregister(self, name):
+        """Remove a gesture by name. Returns True if it existed."""
+        gesture = self.gestures.pop(name, None)
+        if gesture is None:
+            return False
+        if gesture.code is not None:
+            self.table[gesture.code].remove(gesture)
+        if self.active is gesture:
+            self.active = None
+        return True
+
+    def bind(self, name, handler):
+        """Set the handler of a registered gesture."""
+        self.gestures[name].handler = handler
+
+    def bind_all(self, handlers):
+        """Set handlers from a dict of name -> handler, ignoring unknown names."""
+        for name, handler in handlers.items():
+            if name in self.gestures:
+                self.gestures[name].handler = handler
+
+    def label_codes(self, labels):
+        """
+        Finger codes for gesture labels, e.g. from classifier.GestureClassifier,
+        so a classifier can stand in for fingersUp.
+
+        Args:
+            labels: Gesture names, one per hand; None or unknown names for no pose
+
+        Returns:
+            List with the finger code of each label's gesture, or None
+        """
+        codes = []
+        for label in labels:
+            gesture = self.gestures.get(label)
+            codes.append(gesture.code if gesture is not None else None)
+        return codes
+
     def is_in_gesture_area(self, hand):
         """
         Check if a hand is in the gesture detection area (upper right corner).
-        
+
         Args:
             hand: Hand dictionary from HandDetector
-        
+
         Returns:
             True if the hand is in the gesture area, False otherwise
         """
         if not hand:
             return False
-            
         cx, cy = hand["center"]
-        return (cy < self.gesture_threshold_y and cx > self.gesture_threshold_x)
-    
-    def recognize_gesture(self, hand, fingers):
+        return cy < self.gesture_threshold_y and cx > self.gesture_threshold_x
+
+    def confirmed(self, gesture, now):
+        """True if the gesture's pose was seen in k of its last m frames."""
+        k, m = gesture.confirm
+        if not self.history:
+            return False
+        if k <= 1 and m <= 1:
+            return self.history[-1][1] == gesture.code
+        oldest = now - self.window
+        count = 0
+        for i in range(1, min(m, len(self.history)) + 1):
+            timestamp, code = self.history[-i]
+            if timestamp < oldest:
+                break
+            if code == gesture.code:
+                count += 1
+        return count >= k
+
+    def release(self):
+        """Release the active gesture, e.g. when the hand is lost."""
+        self.active = None
+        self.fired_at = None
+
+    def dispatch(self, hand, fingers, timestamp=None, predicted=False):
+        """
+        Feed one frame and fire the gesture that is due, if any. Call once
+        per frame, with hand=None when no hand is visible.
+
+        Args:
+            hand: Hand dictionary from HandDetector, or None
+            fingers: Finger list or 5-bit code of the hand, or None for a
+                hand in no known pose (see label_codes)
+            timestamp: Monotonic capture time in seconds (default: now)
+            predicted: True when the hand was extrapolated instead of detected
+                (HandsResult.predicted). Such frames repeat the last detection,
+                so they don't count towards confirming a pose; gestures that
+                are already confirmed keep acting on them.
+
+        Returns:
+            The Gesture that fired on this frame, or None
+        """
+        now = self.clock() if timestamp is None else timestamp
+        code = finger_code(fingers) if hand and fingers is not None else -1
+        if not predicted:
+            self.history.append((now, code))
+        if self.motion is not None:
+            gesture = self.dispatch_motion(hand, code, now, predicted)
+            if gesture is not None:
+                return gesture
+
+        # Press the first candidate for this pose whose area and confirmation rules hold
+        pressed = None
+        if code >= 0:
+            inside = self.is_in_gesture_area(hand)
+            for gesture in self.table[code]:
+                if gesture.area is not ANYWHERE and (gesture.area is IN_AREA) != inside:
+                    continue
+                if gesture.condition is not None and not gesture.condition(hand):
+                    continue
+                if self.confirmed(gesture, now):
+                    pressed = gesture
+                    break
+
+        if pressed is None:
+            # Another pose on this frame: keep the active gesture until it is no longer confirmed
+            if self.active is not None and not self.confirmed(self.active, now):
+                self.release()
+            return None
+        if pressed is not self.active:
+            self.active = pressed
+            self.pressed_at = now
+            self.fired_at = None
+
+        gesture = self.active
+        if self.fired_at is None:
+            if now - self.pressed_at < gesture.hold:
+                return None
+            cooldown = self.cooldown if gesture.cooldown is None else gesture.cooldown
+            if not gesture.continuous and now - self.last_trigger < cooldown:
+                return None
+        elif gesture.repeat is None or now - self.fired_at < gesture.repeat:
+            return None
+
+        if gesture.handler is not None and gesture.handler(hand) is False:
+            return None
+        self.fired_at = now
+        if not gesture.continuous:
+            self.last_trigger = now
+        return gesture
+
+    def dispatch_motion(self, hand, code, now, predicted=False):
+        """
+        Feed the hand to the motion detector and fire the motion gesture it
+        reports, if the hand's pose and area allow it. Called by dispatch.
+
+        Args:
+            hand: Hand dictionary from HandDetector, or None
+            code: Finger code of the hand, -1 for an unknown pose
+            now: Monotonic capture time in seconds
+            predicted: True for an extrapolated hand; it is not added to the
+                trajectory, as extrapolation adds travel the hand never made
+
+        Returns:
+            The motion Gesture that fired, or None
+        """
+        if not hand or predicted:
+            return None
+        if self.active is not None and self.active.continuous and self.fired_at is not None:
+            # Pointing, drawing and panning move the hand on purpose
+            self.motion.reset()
+            return None
+        gesture = self.gestures.get(self.motion.update(hand["lmList"], now))
+        if gesture is None:
+            return None
+        if gesture.poses is not None and code not in gesture.poses:
+            return None
+        if gesture.area is not ANYWHERE and (gesture.area is IN_AREA) != self.is_in_gesture_area(hand):
+            return None
+        cooldown = self.cooldown if gesture.cooldown is None else gesture.cooldown
+        if now - self.last_trigger < cooldown:
+            return None
+        if gesture.handler is not None and gesture.handler(hand) is False:
+            return None
+        self.last_trigger = now
+        return gesture
+
+
+class GestureRecognizer:
+    """
+    Recognizes hand gestures for controlling the presentation.
+
+    Backed by a GestureEngine with DEFAULT_GESTURES, so it reports every
+    gesture of the table with that table's area rules: POINTER, DRAW and
+    ERASE are recognized anywhere, not only in the gesture area, and PAN
+    only outside of it. As before, one cooldown is shared by all
+    triggered actions; continuous ones are not affected by it.
+    """
+
+    def __init__(self, gesture_threshold_x=650, gesture_threshold_y=300,
+                gesture_delay=None, cooldown=0.15, smoothing=None, motion=None, classifier=None):
+        """
+        Initialize the gesture recognizer with thresholds.
+
+        Args:
+            gesture_threshold_x: X-coordinate threshold for gesture detection area
+            gesture_threshold_y: Y-coordinate threshold for gesture detection area
+            gesture_delay: Deprecated frame count between gestures, converted
+                to seconds at 30 fps; use cooldown instead
+            cooldown: Minimum seconds between two triggered gestures
+            smoothing: Optional dict of action name (e.g. "DRAW") -> filters.HandSmoother
+                used for that action's pointer position, see smooth()
+            motion: Optional motion.MotionDetector; its swipes and circles are
+                recognized next to the static poses under their motion names
+            classifier: Optional classifier.GestureClassifier used by classify()
+                in place of the fingersUp rules
+        """
+        if gesture_delay is not None:
+            cooldown = gesture_delay / 30
+        self.engine = GestureEngine(gesture_threshold_x, gesture_threshold_y, cooldown=cooldown, motion=motion)
+        self.smoothing = smoothing or {}
+        self.smoothed = {}  # action -> smoothed HandsResult of the current frame
+        self.classifier = classifier
+
+    @property
+    def gesture_threshold_x(self):
+        """X-coordinate threshold of the gesture area."""
+        return self.engine.gesture_threshold_x
+
+    @gesture_threshold_x.setter
+    def gesture_threshold_x(self, value):
+        self.engine.gesture_threshold_x = value
+
+    @property
+    def gesture_threshold_y(self):
+        """Y-coordinate threshold of the gesture area."""
+        return self.engine.gesture_threshold_y
+
+    @gesture_threshold_y.setter
+    def gesture_threshold_y(self, value):
+        self.engine.gesture_threshold_y = value
+
+    @property
+    def gesture_cooldown(self):
+        """
+        Seconds until another gesture can trigger, 0 when none is pending.
+        Read-only; formerly a frame count. Measured with the engine's clock,
+        so it only makes sense when recognize_gesture gets no timestamps.
+        """
+        return max(0.0, self.engine.cooldown - (self.engine.clock() - self.engine.last_trigger))
+
+    @property
+    def gesture_active(self):
+        """True while a gesture is pressed (confirmed and not yet released). Read-only."""
+        return self.engine.active is not None
+
+    def is_in_gesture_area(self, hand):
         """
-        Recognize a gesture based on finger positions.
-        
+        Check if a hand is in the gesture detection area (upper right corner).
+
         Args:
             hand: Hand dictionary from HandDetector
-            fingers: List of finger states (0 or 1) from HandDetector.fingersUp()
-            
+
+        Returns:
+            True if the hand is in the gesture area, False otherwise
+        """
+        return self.engine.is_in_gesture_area(hand)
+
+    def recognize_gesture(self, hand, fingers, timestamp=None, predicted=False):
+        """
+        Recognize a gesture based on finger positions. Call once per frame.
+
+        Args:
+            hand: Hand dictionary from HandDetector, or None without a hand
+            fingers: List of finger states (0 or 1) from HandDetector.fingersUp(),
+                or a finger code from classify()
+            timestamp: Monotonic capture time in seconds (default: now)
+            predicted: True for extrapolated hands, see GestureEngine.dispatch
+
         Returns:
             Tuple of (action, should_trigger)
             action: String describing the recognized gesture, or None
             should_trigger: Boolean indicating if the action should be triggered
         """
-        # Check if we're in cooldown period
-        if self.gesture_cooldown > 0:
-            self.gesture_cooldown -= 1
+        gesture = self.engine.dispatch(hand, fingers, timestamp, predicted)
+        if gesture is None:
             return None, False
-            
-        # Check if hand is in gesture area
-        if not self.is_in_gesture_area(hand):
-            return None, False
-            
-        # Recognize gestures and return the action
-        action = None
-        should_trigger = False
-        
-        # Next Slide (0,1,1,1,1) - All fingers except thumb
-        if fingers == [0, 1, 1, 1, 1]:
-            action = "NEXT_SLIDE"
-            should_trigger = True
-            
-        # Previous Slide (1,0,0,0,0) - Only thumb
-        elif fingers == [1, 0, 0, 0, 0]:
-            action = "PREV_SLIDE"
-            should_trigger = True
-            
-        # Clear Annotations (1,1,1,1,1) - All five fingers
-        elif fingers == [1, 1, 1, 1, 1]:
-            action = "CLEAR_ANNOTATIONS"
-            should_trigger = True
-        
-        # Pointer Mode (0,1,1,0,0) - Index and middle finger
-        elif fingers == [0, 1, 1, 0, 0]:
-            action = "POINTER"
-            should_trigger = False  # Pointer doesn't need cooldown
-            
-        # Draw Mode (0,1,0,0,0) - Only index finger
-        elif fingers == [0, 1, 0, 0, 0]:
-            action = "DRAW"
-            should_trigger = False  # Drawing doesn't need cooldown
-            
-        # Erase Last (0,1,1,1,0) - Index, middle, and ring fingers
-        elif fingers == [0, 1, 1, 1, 0]:
-            action = "ERASE"
-            should_trigger = True
-            
-        # If we should trigger an action, start the cooldown
-        if should_trigger:
-            self.gesture_cooldown = self.gesture_delay
-            
-        return action, should_trigger
-        
-    def get_pointer_position(self, hand, width, height):
+        return gesture.name, not gesture.continuous
+
+    def classify(self, hands):
+        """
+        Finger codes of all hands in a frame from the classifier, in one
+        batch. Pass a hand's entry as `fingers` to recognize_gesture.
+
+        Args:
+            hands: HandsResult from the detector
+
+        Returns:
+            List with a finger code, or None for no known pose, per hand
+        """
+        return self.engine.label_codes(self.classifier.predict(hands))
+
+    def smooth(self, hands, timestamp=None):
+        """
+        Run the smoothing filters on a frame's detection result. Call once
+        per frame, also without hands, before get_pointer_position.
+
+        Args:
+            hands: HandsResult from the detector
+            timestamp: Monotonic capture time in seconds (default: now)
+        """
+        self.smoothed = {action: smoother(hands, timestamp) for action, smoother in self.smoothing.items()}
+
+    def get_pointer_position(self, hand, width, height, action=None):
         """
         Get the position of the pointer (index finger tip).
-        
+
         Args:
             hand: Hand dictionary from HandDetector
             width: Width of the frame
             height: Height of the frame
-            
+            action: Action the position is for; with smoothing configured for
+                it, the smoothed landmarks of the same hand are used
+
         Returns:
             The (x, y) position of the pointer on the screen
         """
-        if not hand:
-            return None
-            
-        lm_list = hand["lmList"]
-        if not lm_list or len(lm_list) < 9:
-            return None
-            
-        # Get index finger tip position (landmark 8)
-        x_val = int(np.interp(lm_list[8][0], [width // 2, width], [0, width]))
-        y_val = int(np.interp(lm_list[8][1], [150, height - 150], [0, height]))
-        
-        return (x_val, y_val)
+        smoothed = self.smoothed.get(action)
+        if hand and smoothed:
+            for smoothed_hand in smoothed:
+                if smoothed_hand["type"] == hand["type"]:
+                    hand = smoothed_hand
+                    break
+        return pointer_position(hand, width, height)
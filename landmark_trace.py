@@ -0,0 +1,185 @@
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from landmarks import HandsResult, fingers_up
+
+# Per-frame record: capture time, number of hands and index of the frame's
+# first hand in the chunk's landmark/handedness arrays
+FRAME_DTYPE = np.dtype([("timestamp", "<f8"), ("count", "u1"), ("first", "<u4")])
+
+
+class TraceRecorder:
+    """
+    Records detected hands to a compact binary trace so a session can be
+    replayed without a camera or MediaPipe. A trace is a directory of chunks,
+    each stored as plain .npy files that can be memory-mapped on load:
+
+        meta.json                 image shape and format version
+        NNNNN.frames.npy          (F,) FRAME_DTYPE records
+        NNNNN.landmarks.npy       (H, 21, 3) float32 landmarks in pixels
+        NNNNN.handedness.npy      (H,) bool, True for a right hand
+    """
+
+    def __init__(self, path, chunk_frames=1000):
+        """
+        Args:
+            path: Directory to write the trace into (created if missing)
+            chunk_frames: Number of frames per chunk file
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.chunk = 0
+        self.shape = None
+        self._reset_buffers()
+        os.makedirs(path, exist_ok=True)
+
+    def _reset_buffers(self):
+        self.frames = np.zeros(self.chunk_frames, dtype=FRAME_DTYPE)
+        self.n_frames = 0
+        self.landmarks = []
+        self.handedness = []
+        self.n_hands = 0
+
+    def record(self, hands, timestamp=None):
+        """
+        Append one frame.
+
+        Args:
+            hands: HandsResult of the frame
+            timestamp: Capture time in seconds (defaults to time.monotonic())
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self.shape is None and hands.shape is not None:
+            self.shape = tuple(hands.shape)
+        self.frames[self.n_frames] = (timestamp, len(hands), self.n_hands)
+        self.n_frames += 1
+        if len(hands):
+            self.landmarks.append(hands.landmarks)
+            self.handedness.append(hands.handedness)
+            self.n_hands += len(hands)
+        if self.n_frames == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Write buffered frames to a new chunk."""
+        if self.n_frames == 0:
+            return
+        if self.landmarks:
+            landmarks = np.concatenate(self.landmarks)
+            handedness = np.concatenate(self.handedness)
+        else:
+            landmarks = np.zeros((0, 21, 3), dtype=np.float32)
+            handedness = np.zeros(0, dtype=bool)
+        prefix = os.path.join(self.path, f"{self.chunk:05d}")
+        np.save(prefix + ".frames.npy", self.frames[:self.n_frames])
+        np.save(prefix + ".landmarks.npy", landmarks)
+        np.save(prefix + ".handedness.npy", handedness)
+        self.chunk += 1
+        self._reset_buffers()
+
+    def close(self):
+        """Flush the remaining frames and write the trace metadata."""
+        self.flush()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"version": 1, "shape": self.shape}, f)
+
+
+class TraceReplayer:
+    """
+    Replays a trace written by TraceRecorder. It can be iterated directly,
+    played back at any speed, or used in place of a HandDetector: findHands
+    ignores the image and returns the next recorded frame.
+    """
+
+    def __init__(self, path, loop=False):
+        """
+        Args:
+            path: Trace directory
+            loop: Start over from the first frame when the trace ends
+        """
+        self.path = path
+        self.loop = loop
+        meta_path = os.path.join(path, "meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        self.shape = tuple(meta["shape"]) if meta.get("shape") else None
+
+        self.chunks = []
+        for frames_path in sorted(glob.glob(os.path.join(path, "*.frames.npy"))):
+            prefix = frames_path[:-len(".frames.npy")]
+            self.chunks.append((np.load(frames_path, mmap_mode="r"),
+                                np.load(prefix + ".landmarks.npy", mmap_mode="r"),
+                                np.load(prefix + ".handedness.npy", mmap_mode="r")))
+        self.n_frames = sum(len(frames) for frames, _, _ in self.chunks)
+        self._iter = None
+
+    def __len__(self):
+        return self.n_frames
+
+    def __iter__(self):
+        """Yield (timestamp, HandsResult) for every recorded frame."""
+        for frames, landmarks, handedness in self.chunks:
+            for timestamp, count, first in frames.tolist():
+                yield timestamp, HandsResult(landmarks[first:first + count],
+                                             handedness[first:first + count], shape=self.shape)
+
+    def landmarks(self):
+        """
+        All recorded hands at once.
+
+        Returns:
+            Tuple of ((H, 21, 3) landmarks, (H,) handedness) over the whole trace
+        """
+        if not self.chunks:
+            return np.zeros((0, 21, 3), dtype=np.float32), np.zeros(0, dtype=bool)
+        return (np.concatenate([lm for _, lm, _ in self.chunks]),
+                np.concatenate([hd for _, _, hd in self.chunks]))
+
+    def play(self, speed=1.0):
+        """
+        Yield frames paced like the recording.
+
+        Args:
+            speed: Playback speed factor (e.g. 100 for 100x real time);
+                0 or None plays back as fast as possible
+        """
+        start = None
+        for timestamp, hands in self:
+            if speed:
+                if start is None:
+                    start = (timestamp, time.monotonic())
+                delay = (timestamp - start[0]) / speed - (time.monotonic() - start[1])
+                if delay > 0:
+                    time.sleep(delay)
+            yield timestamp, hands
+
+    def findHands(self, img=None, draw_lm=True, draw_bbox=True, flipType=True, timestamp=None):
+        """
+        Return the next recorded frame's hands, with the same return values
+        as HandDetector.findHands. Once the trace ends, no hands are returned
+        unless looping. The image and timestamp are ignored; the recorded
+        capture times come with iterating or play().
+        """
+        if self._iter is None:
+            self._iter = iter(self)
+        try:
+            _, hands = next(self._iter)
+        except StopIteration:
+            if self.loop and self.n_frames:
+                self._iter = iter(self)
+                _, hands = next(self._iter)
+            else:
+                hands = HandsResult.empty(shape=self.shape)
+        if draw_lm or draw_bbox:
+            return hands, img
+        return hands
+
+    def fingersUp(self, myHand):
+        return fingers_up(myHand["lmList"], myHand["type"] == "Right")[0].tolist()
@@ -0,0 +1,151 @@
+import numpy as np
+
+# Landmark ids of the finger tips: thumb, index, middle, ring, pinky
+TIP_IDS = np.array([4, 8, 12, 16, 20])
+# Bit weights used to pack a finger state into a 5-bit code. The thumb is the
+# most significant bit so the code reads like the finger list: [0,1,1,1,1] -> 0b01111
+FINGER_WEIGHTS = np.array([16, 8, 4, 2, 1], dtype=np.uint8)
+
+
+def fingers_up(landmarks, handedness):
+    """
+    Finds which fingers are open for any number of hands in one call.
+    Same rules as HandDetector.fingersUp: the thumb compares x of landmarks
+    4 and 3 (direction depends on handedness), the other fingers compare y
+    of the tip against the joint two landmarks below it.
+
+    Args:
+        landmarks: (21, 2+) landmarks of one hand or (N, 21, 2+) for N hands
+        handedness: True/"Right" for right hands, scalar or one per hand
+
+    Returns:
+        (N, 5) uint8 array of finger states, thumb first
+    """
+    lm = np.asarray(landmarks)
+    lm = lm.reshape(-1, 21, lm.shape[-1])
+    right = np.asarray(handedness)
+    if right.dtype.kind in "UO":
+        right = right == "Right"
+    right = right.astype(bool)
+
+    fingers = np.empty((len(lm), 5), dtype=np.uint8)
+    thumb_dx = lm[:, TIP_IDS[0], 0] - lm[:, TIP_IDS[0] - 1, 0]
+    fingers[:, 0] = np.where(right, thumb_dx > 0, thumb_dx < 0)
+    fingers[:, 1:] = lm[:, TIP_IDS[1:], 1] < lm[:, TIP_IDS[1:] - 2, 1]
+    return fingers
+
+
+def pack_fingers(fingers):
+    """
+    Pack finger states into 5-bit codes.
+
+    Args:
+        fingers: Finger list [thumb, index, middle, ring, pinky] or (..., 5) array
+
+    Returns:
+        The code as an int for a single finger list, else a uint8 array
+    """
+    codes = np.asarray(fingers, dtype=np.uint8) @ FINGER_WEIGHTS
+    return int(codes) if codes.ndim == 0 else codes
+
+
+def fingers_code(landmarks, handedness):
+    """
+    Finger states of many hands packed into 5-bit codes, see fingers_up.
+
+    Returns:
+        (N,) uint8 array of codes
+    """
+    return fingers_up(landmarks, handedness) @ FINGER_WEIGHTS
+
+
+def hands_from_mediapipe(results, width, height, flip_type=True):
+    """
+    Convert a MediaPipe Hands result into a HandsResult, as HandDetector.findHands does.
+
+    Args:
+        results: Return value of mediapipe Hands.process()
+        width: Width of the image the landmarks are normalized to
+        height: Height of the image the landmarks are normalized to
+        flip_type: Swap left and right, for mirrored images
+
+    Returns:
+        HandsResult with landmarks in pixels
+    """
+    if not results.multi_hand_landmarks:
+        return HandsResult.empty(shape=(height, width))
+    raw = np.array([[(lm.x, lm.y, lm.z) for lm in handLms.landmark]
+                    for handLms in results.multi_hand_landmarks], dtype=np.float64)
+    handedness = np.array([handType.classification[0].label == "Right"
+                           for handType in results.multi_handedness], dtype=bool)
+    if flip_type:
+        handedness = ~handedness
+    return HandsResult(raw * (width, height, width), handedness, shape=(height, width))
+
+
+class HandsResult:
+    """
+    Array-backed hand detection result. Landmarks, bounding boxes, centers
+    and handedness for all hands are stored as NumPy arrays; indexing or
+    iterating gives the classic hand dicts ("lmList", "bbox", "center",
+    "bottom", "top", "type"), which are only built when asked for.
+    """
+
+    def __init__(self, landmarks, handedness, shape=None, predicted=False):
+        """
+        Args:
+            landmarks: (n_hands, 21, 3) landmark array in pixel units
+            handedness: (n_hands,) bool array, True for a right hand
+            shape: (height, width) of the image the landmarks refer to
+            predicted: True when the landmarks were extrapolated instead of detected
+        """
+        self.landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+        self.handedness = np.asarray(handedness, dtype=bool).reshape(-1)
+        self.shape = shape
+        self.predicted = predicted
+        # Integer pixels truncate like int(lm.x * w) did in the list based code
+        self.pixels = np.asarray(landmarks).reshape(-1, 21, 3).astype(np.int32)
+        xy = self.pixels[:, :, :2]
+        self.top = xy.max(axis=1)
+        self.bottom = xy.min(axis=1)
+        size = self.top - self.bottom
+        self.bbox = np.concatenate([self.bottom, size], axis=1)
+        self.center = self.bottom + size // 2
+        self._dicts = [None] * len(self.landmarks)
+
+    @classmethod
+    def empty(cls, shape=None):
+        """Result with no hands."""
+        return cls(np.zeros((0, 21, 3), dtype=np.float32), np.zeros(0, dtype=bool), shape)
+
+    def fingersUp(self):
+        """Finger states of every hand as an (n_hands, 5) array."""
+        return fingers_up(self.pixels, self.handedness)
+
+    def __len__(self):
+        return len(self._dicts)
+
+    def __bool__(self):
+        return len(self._dicts) > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        myHand = self._dicts[i]
+        if myHand is None:
+            myHand = {
+                "lmList": self.pixels[i].tolist(),
+                "bbox": tuple(self.bbox[i].tolist()),
+                "center": tuple(self.center[i].tolist()),
+                "bottom": tuple(self.bottom[i].tolist()),
+                "top": tuple(self.top[i].tolist()),
+                "type": "Right" if self.handedness[i] else "Left",
+            }
+            self._dicts[i] = myHand
+        return myHand
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
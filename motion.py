@@ -0,0 +1,236 @@
+import math
+import time
+
+import numpy as np
+
+# Landmarks averaged into the palm center: wrist and the four finger bases.
+# They barely move when fingers bend, unlike the bounding box center.
+PALM = [0, 5, 9, 13, 17]
+PALM_WEIGHTS = np.zeros(21, dtype=np.float32)
+PALM_WEIGHTS[PALM] = 1 / len(PALM)
+
+SWIPE_LEFT = "SWIPE_LEFT"
+SWIPE_RIGHT = "SWIPE_RIGHT"
+CIRCLE_CW = "CIRCLE_CW"
+CIRCLE_CCW = "CIRCLE_CCW"
+MOTIONS = [SWIPE_LEFT, SWIPE_RIGHT, CIRCLE_CW, CIRCLE_CCW]
+
+
+class LandmarkHistory:
+    """
+    Fixed-size ring buffer of the most recent hand positions: timestamps,
+    palm centers, hand sizes and the full 21x3 landmarks. Every frame is
+    written twice, at i and i + capacity, into preallocated arrays of twice
+    the capacity, so the last n frames are always one contiguous slice.
+    Recording allocates nothing and windows are views, not copies.
+    """
+
+    def __init__(self, capacity=64):
+        """
+        Args:
+            capacity: Number of frames kept, e.g. 64 is about 2 s at 30 fps
+        """
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self.centers = np.zeros((2 * capacity, 2), dtype=np.float32)
+        self.sizes = np.zeros(2 * capacity, dtype=np.float32)
+        self.landmarks = np.zeros((2 * capacity, 21, 3), dtype=np.float32)
+        self.count = 0  # frames pushed since the last clear
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        """Forget all frames."""
+        self.count = 0
+
+    def push(self, landmarks, timestamp):
+        """
+        Record one hand.
+
+        Args:
+            landmarks: (21, 3) landmarks in pixels, array or lmList
+            timestamp: Monotonic time of the frame in seconds
+        """
+        i = self.count % self.capacity
+        lm = self.landmarks[i]
+        lm[:] = landmarks
+        center = PALM_WEIGHTS @ lm[:, :2]
+        dx, dy = (lm[9, :2] - lm[0, :2]).tolist()
+        for j in (i, i + self.capacity):
+            self.landmarks[j] = lm
+            self.timestamps[j] = timestamp
+            self.centers[j] = center
+            # Wrist to middle finger base: a scale that follows the distance to the camera
+            self.sizes[j] = max(math.hypot(dx, dy), 1.0)
+        self.count += 1
+
+    @property
+    def last_timestamp(self):
+        """Time of the newest frame, None when empty."""
+        return float(self.timestamps[(self.count - 1) % self.capacity]) if self.count else None
+
+    def recent(self, seconds):
+        """
+        Slice of the buffer arrays holding the frames of the last `seconds`,
+        oldest first, e.g. history.centers[history.recent(0.5)].
+        """
+        end = (self.count - 1) % self.capacity + self.capacity + 1
+        start = end - len(self)
+        times = self.timestamps[start:end]
+        if len(times):
+            start += int(times.searchsorted(times[-1] - seconds))
+        return slice(start, end)
+
+
+class MotionDetector:
+    """
+    Detects dynamic gestures, left/right swipes and circles, from the palm
+    center trajectory in a LandmarkHistory. The features are computed with a
+    few vectorized NumPy operations over the recent frames and are measured
+    in hand sizes, so the thresholds hold at any distance from the camera.
+
+    A swipe is a mostly horizontal, consistently directed and straight
+    movement over `swipe_distance` hand sizes within `swipe_window` seconds.
+    A circle is a trajectory that sweeps `circle_turn` radians around its
+    middle within `circle_window` seconds while spanning at least
+    `circle_size` hand sizes. The first part of a large circle can look like
+    a swipe, so swipes are not reported while a circle is building, i.e.
+    once the trajectory swept two thirds of `circle_turn`: more than half a
+    turn, which a straight or L-shaped path (raising the hand, then swiping)
+    never sweeps.
+    Directions are in image coordinates (y pointing down), so after the
+    mirror flip of the camera image they match what the presenter sees.
+    """
+
+    def __init__(self, capacity=64, swipe_window=0.5, swipe_distance=3.0, swipe_straightness=0.5,
+                 swipe_consistency=0.75, swipe_turn=math.pi / 6, circle_window=1.5, circle_turn=1.8 * math.pi, circle_size=1.5,
+                 circle_consistency=0.8, refractory=0.5, max_gap=0.25):
+        """
+        Args:
+            capacity: Frames kept in the history
+            swipe_window: Seconds a swipe may take
+            swipe_distance: Minimum horizontal travel of a swipe in hand sizes
+            swipe_straightness: Maximum vertical travel relative to the horizontal travel
+            swipe_consistency: Minimum fraction of frame-to-frame steps moving in the swipe direction
+            swipe_turn: Maximum angle in radians between the directions of the
+                first and the second half of a swipe; rejects curved paths
+            circle_window: Seconds a circle may take
+            circle_turn: Minimum angle in radians the palm sweeps around the circle's middle
+            circle_size: Minimum width and height of a circle in hand sizes
+            circle_consistency: Minimum fraction of frames moving around in the circle's direction
+            refractory: Seconds after a detected motion in which no other
+                motion is reported, so the hand can return after a swipe
+            max_gap: Seconds without a hand after which the history restarts
+        """
+        self.history = LandmarkHistory(capacity)
+        self.swipe_window = swipe_window
+        self.swipe_distance = swipe_distance
+        self.swipe_straightness = swipe_straightness
+        self.swipe_consistency = swipe_consistency
+        self.swipe_turn = swipe_turn
+        self.circle_window = circle_window
+        self.circle_turn = circle_turn
+        self.circle_size = circle_size
+        self.circle_consistency = circle_consistency
+        self.refractory = refractory
+        self.max_gap = max_gap
+        self.resume_at = float("-inf")
+
+    def reset(self):
+        """Forget the trajectory, e.g. while another gesture is in progress."""
+        self.history.clear()
+        self.resume_at = float("-inf")
+
+    def update(self, landmarks, timestamp=None):
+        """
+        Add a frame and check for a completed motion. The history is cleared
+        when a motion is detected, so each movement is reported once, and
+        frames are ignored for the refractory period after it.
+
+        Args:
+            landmarks: (21, 3) landmarks of the hand in pixels, array or lmList
+            timestamp: Monotonic capture time in seconds (default: now)
+
+        Returns:
+            SWIPE_LEFT, SWIPE_RIGHT, CIRCLE_CW, CIRCLE_CCW or None
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        if now < self.resume_at:
+            return None
+        last = self.history.last_timestamp
+        if last is not None and not 0 < now - last <= self.max_gap:
+            self.history.clear()
+        self.history.push(landmarks, now)
+
+        motion = self.swipe()
+        if motion is not None and self.circling():
+            motion = None
+        motion = motion or self.circle()
+        if motion is not None:
+            self.history.clear()
+            self.resume_at = now + self.refractory
+        return motion
+
+    def swipe(self):
+        """SWIPE_LEFT or SWIPE_RIGHT if the recent trajectory is a swipe, else None."""
+        history = self.history
+        window = history.recent(self.swipe_window)
+        centers = history.centers[window]
+        if len(centers) < 4:
+            return None
+        # Net travel first: it rules out almost every frame before any array work
+        dx, dy = ((centers[-1] - centers[0]) / history.sizes[window.stop - 1]).tolist()
+        if abs(dx) < self.swipe_distance or abs(dy) > self.swipe_straightness * abs(dx):
+            return None
+        steps = np.diff(centers[:, 0])
+        if np.count_nonzero(steps * dx > 0) < self.swipe_consistency * len(steps):
+            return None
+        # A swipe is straight; an arc turns between the first and the second
+        # half of its length by half its angle, while jitter hardly moves
+        # these long chords
+        travel = np.hypot(*np.diff(centers, axis=0).T).cumsum()
+        middle = centers[1 + int(travel.searchsorted(travel[-1] / 2))]
+        (ax, ay), (bx, by) = (middle - centers[0]).tolist(), (centers[-1] - middle).tolist()
+        if abs(math.atan2(ax * by - ay * bx, ax * bx + ay * by)) > self.swipe_turn:
+            return None
+        return SWIPE_RIGHT if dx > 0 else SWIPE_LEFT
+
+    def circle(self):
+        """CIRCLE_CW or CIRCLE_CCW if the recent trajectory is a circle, else None."""
+        turn = self._sweep()
+        if abs(turn) < self.circle_turn:
+            return None
+        # Angles grow clockwise on screen because image y points down
+        return CIRCLE_CW if turn > 0 else CIRCLE_CCW
+
+    def circling(self):
+        """True while the recent trajectory is on its way to becoming a circle."""
+        return abs(self._sweep()) >= self.circle_turn * 2 / 3
+
+    def _sweep(self):
+        """
+        Signed angle in radians the palm swept around the middle of its
+        trajectory in the last `circle_window` seconds, positive clockwise on
+        screen. 0.0 for trajectories too small or too erratic for a circle.
+        """
+        history = self.history
+        window = history.recent(self.circle_window)
+        centers = history.centers[window]
+        if len(centers) < 8:
+            return 0.0
+        size = history.sizes[window].mean()
+        low, high = centers.min(axis=0), centers.max(axis=0)
+        if (high - low).min() < self.circle_size * size:
+            return 0.0
+        # Sweep of the palm around the middle of the trajectory; far less
+        # sensitive to jitter than the turning of frame-to-frame steps
+        offsets = centers - (low + high) / 2
+        angles = np.arctan2(offsets[:, 1], offsets[:, 0])
+        # Angle change between consecutive frames, wrapped to [-pi, pi)
+        sweeps = (np.diff(angles) + math.pi) % (2 * math.pi) - math.pi
+        turn = float(sweeps.sum())
+        # A wandering hand sweeps around too, but back and forth
+        if np.count_nonzero(sweeps * turn > 0) < self.circle_consistency * len(sweeps):
+            return 0.0
+        return turn
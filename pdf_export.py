@@ -0,0 +1,144 @@
+import os
+import tempfile
+import threading
+
+import fitz  # PyMuPDF for handling PDFs
+import numpy as np
+
+from slides import fit_page
+
+
+def export_annotated_pdf(file_path, out_path, annotations, size, color=(0, 0, 255), thickness=4,
+                         progress=None):
+    """
+    Write a copy of a PDF with annotations added as vector ink annotations.
+    Only annotated pages are touched and nothing is rasterized, so the cost
+    depends on the amount of ink rather than on the size of the deck.
+
+    Args:
+        file_path: Source PDF
+        out_path: Destination PDF, not the source file: the source is open
+            while the copy is written, and can't be replaced on Windows
+        annotations: Dict of page number -> list of (points, transform) per
+            stroke, e.g. AnnotationStore.snapshot(). points are (n, 2) in
+            display pixels; transform is the (scale, offset_x, offset_y) page
+            to display mapping they were drawn in (see
+            SlideDeck.viewport_transform), None for the page fitted to `size`
+        size: (width, height) the slides were displayed at
+        color: BGR stroke colour, as used for drawing
+        thickness: Stroke thickness in display pixels
+        progress: Optional callback(done, total) called after each page
+
+    Returns:
+        Number of pages that received annotations
+
+    Raises:
+        ValueError: If out_path is the source file
+    """
+    if os.path.exists(out_path) and os.path.samefile(file_path, out_path):
+        raise ValueError("Export the annotated PDF to a new file, not over the presentation")
+    pages = sorted(p for p, strokes in annotations.items() if any(len(s) >= 2 for s, _ in strokes))
+    stroke_color = (color[2] / 255, color[1] / 255, color[0] / 255)
+    doc = fitz.open(file_path)
+    try:
+        for done, page_num in enumerate(pages, 1):
+            if not 0 <= page_num < len(doc):
+                continue
+            page = doc[page_num]
+            # Undo the transform each stroke's view was shown with. Strokes
+            # drawn at one zoom share an ink annotation, as they share a width
+            inks = {}
+            for points, transform in annotations[page_num]:
+                if len(points) < 2:
+                    continue
+                scale, offset_x, offset_y = transform or fit_page(page.rect, size)
+                origin = np.array([offset_x, offset_y])
+                ink = (np.asarray(points, dtype=np.float64) - origin) / scale + (page.rect.x0, page.rect.y0)
+                inks.setdefault(scale, []).append(ink.tolist())
+            for scale, ink in inks.items():
+                annot = page.add_ink_annot(ink)
+                annot.set_colors(stroke=stroke_color)
+                annot.set_border(width=thickness / scale)
+                annot.update()
+            if progress is not None:
+                progress(done, len(pages))
+
+        # Save next to the destination and swap it in, so an existing file
+        # is never left half-written
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(os.path.abspath(out_path)))
+        os.close(fd)
+        try:
+            doc.save(tmp_path, garbage=1, deflate=True)
+            doc.close()
+            os.replace(tmp_path, out_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    finally:
+        if not doc.is_closed:
+            doc.close()
+    return len(pages)
+
+
+class PDFExportJob:
+    """
+    Runs export_annotated_pdf on a background thread so the presentation
+    loop keeps running. Progress and the outcome are exposed as attributes
+    that the loop can poll and draw.
+    """
+
+    def __init__(self, file_path, out_path, annotations, size, **kwargs):
+        """
+        Args:
+            file_path: Source PDF
+            out_path: Destination PDF
+            annotations: Snapshot of the annotations, see export_annotated_pdf
+            size: (width, height) the slides were displayed at
+            **kwargs: Stroke style passed to export_annotated_pdf
+        """
+        self.file_path = file_path
+        self.out_path = out_path
+        self.annotations = annotations
+        self.size = size
+        self.kwargs = kwargs
+        self.done = 0
+        self.total = 0
+        self.pages = None   # number of annotated pages once finished
+        self.error = None   # exception raised by the export, if any
+        self.thread = None
+
+    def start(self):
+        """Start exporting and return immediately."""
+        self.thread = threading.Thread(target=self.run, name="PDFExport", daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        """Export on the calling thread."""
+        try:
+            self.pages = export_annotated_pdf(self.file_path, self.out_path, self.annotations, self.size,
+                                              progress=self._progress, **self.kwargs)
+            print(f"Exported {self.pages} annotated slides to {self.out_path}")
+        except Exception as e:
+            self.error = e
+            print(f"Error exporting annotations: {e}")
+
+    def _progress(self, done, total):
+        self.done, self.total = done, total
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def status(self):
+        """Short human readable progress text."""
+        if self.error is not None:
+            return "Export failed"
+        if self.running:
+            return f"Exporting {self.done}/{self.total}" if self.total else "Exporting..."
+        return f"Exported {self.pages} slides"
+
+    def join(self, timeout=None):
+        """Wait for the export to finish."""
+        if self.thread is not None:
+            self.thread.join(timeout)
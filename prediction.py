@@ -0,0 +1,170 @@
+import math
+import time
+
+import numpy as np
+
+from landmarks import HandsResult
+
+
+class LandmarkPredictor:
+    """
+    Extrapolates hand landmarks between detections with a constant-velocity
+    model, so the pointer and draw positions keep moving smoothly on frames
+    where the detector did not run.
+    """
+
+    def __init__(self, max_age=0.25):
+        """
+        Args:
+            max_age: Seconds after the last detection for which landmarks are
+                still predicted; after that the hands are reported as gone
+        """
+        self.max_age = max_age
+        self.landmarks = None
+        self.velocity = None
+        self.handedness = None
+        self.shape = None
+        self.timestamp = None
+
+    def update(self, hands, timestamp):
+        """
+        Feed a real detection.
+
+        Args:
+            hands: HandsResult from the detector
+            timestamp: Monotonic time the frame was captured
+        """
+        landmarks = hands.landmarks
+        if (self.landmarks is not None and len(landmarks) == len(self.landmarks)
+                and len(landmarks) and timestamp > self.timestamp):
+            self.velocity = (landmarks - self.landmarks) / (timestamp - self.timestamp)
+        else:
+            self.velocity = np.zeros_like(landmarks)
+        self.landmarks = landmarks
+        self.handedness = hands.handedness
+        self.shape = hands.shape
+        self.timestamp = timestamp
+
+    def predict(self, timestamp):
+        """
+        Predict the landmarks at the given time.
+
+        Args:
+            timestamp: Monotonic time of the frame to predict for
+
+        Returns:
+            A HandsResult flagged as predicted (empty once max_age has passed)
+        """
+        if self.landmarks is None or timestamp - self.timestamp > self.max_age:
+            return HandsResult.empty(shape=self.shape)
+        landmarks = self.landmarks + self.velocity * (timestamp - self.timestamp)
+        return HandsResult(landmarks, self.handedness, shape=self.shape, predicted=True)
+
+    def reset(self):
+        """Forget the tracked hands."""
+        self.landmarks = None
+        self.velocity = None
+
+
+class DetectionScheduler:
+    """
+    Decides which frames the detector runs on. With adaptive cadence the
+    interval between detections grows or shrinks so that the measured
+    inference time stays under a target share of the frame time.
+    """
+
+    def __init__(self, cadence=1, max_cadence=4, cpu_target=0.5, adaptive=True, smoothing=0.1):
+        """
+        Args:
+            cadence: Run detection every `cadence` frames
+            max_cadence: Upper bound for the adaptive cadence
+            cpu_target: Fraction of the frame time detection may use on average
+            adaptive: Whether to adapt the cadence to the measured inference time
+            smoothing: Weight of new samples in the moving averages
+        """
+        self.min_cadence = max(1, cadence)
+        self.cadence = self.min_cadence
+        self.max_cadence = max(self.min_cadence, max_cadence)
+        self.cpu_target = cpu_target
+        self.adaptive = adaptive
+        self.smoothing = smoothing
+        self.frame_count = 0
+        self.inference_time = None
+        self.frame_interval = None
+        self.last_frame_time = None
+
+    def should_detect(self, timestamp):
+        """
+        Register a new frame and report whether detection should run on it.
+
+        Args:
+            timestamp: Monotonic time of the frame
+        """
+        if self.last_frame_time is not None:
+            self.frame_interval = self._average(self.frame_interval, timestamp - self.last_frame_time)
+        self.last_frame_time = timestamp
+        detect = self.frame_count % self.cadence == 0
+        self.frame_count += 1
+        return detect
+
+    def record_inference(self, seconds):
+        """
+        Report how long a detection took and adapt the cadence.
+
+        Args:
+            seconds: Duration of the detector call
+        """
+        self.inference_time = self._average(self.inference_time, seconds)
+        if not self.adaptive or not self.frame_interval:
+            return
+        needed = math.ceil(self.inference_time / (self.cpu_target * self.frame_interval))
+        self.cadence = min(max(needed, self.min_cadence), self.max_cadence)
+
+    def _average(self, current, sample):
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+
+class PredictiveHandDetector:
+    """
+    Wraps a HandDetector so MediaPipe only runs on some frames. On skipped
+    frames the landmarks are extrapolated from the last detections.
+    """
+
+    def __init__(self, detector, cadence=2, max_cadence=4, cpu_target=0.5, adaptive=True, max_age=0.25):
+        """
+        Args:
+            detector: The HandDetector to run on detection frames
+            cadence: Minimum detection interval in frames
+            max_cadence: Maximum detection interval in frames
+            cpu_target: Fraction of the frame time detection may use on average
+            adaptive: Whether to adapt the cadence to the measured inference time
+            max_age: Seconds landmarks are extrapolated after the last detection
+        """
+        self.detector = detector
+        self.scheduler = DetectionScheduler(cadence, max_cadence, cpu_target, adaptive)
+        self.predictor = LandmarkPredictor(max_age)
+
+    def findHands(self, img, draw_lm=True, draw_bbox=True, flipType=True, timestamp=None):
+        """
+        Finds hands in a BGR image, running the detector only on scheduled frames.
+        Same arguments and return values as HandDetector.findHands; hands on
+        skipped frames have `predicted` set.
+        """
+        now = time.perf_counter()
+        if self.scheduler.should_detect(now):
+            start = time.perf_counter()
+            result = self.detector.findHands(img, draw_lm, draw_bbox, flipType, timestamp)
+            self.scheduler.record_inference(time.perf_counter() - start)
+            hands = result[0] if isinstance(result, tuple) else result
+            self.predictor.update(hands, now)
+            return result
+
+        hands = self.predictor.predict(now)
+        if draw_lm or draw_bbox:
+            return hands, img
+        return hands
+
+    def fingersUp(self, myHand):
+        return self.detector.fingersUp(myHand)
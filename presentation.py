@@ -1,34 +1,49 @@
 import cv2
 import numpy as np
-import fitz  # PyMuPDF for handling PDFs
 import os
 import time
-from utils import draw_dotted_rect, put_text_with_background
+from utils import draw_dotted_rect, put_text_with_background, fit_to_frame
+from slides import SlideDeck
+from raster_cache import DiskRasterCache
+from annotations import AnnotationStore
+from pdf_export import PDFExportJob
+from gestures import pointer_position
 
 class PresentationController:
     """
     Controls the presentation display and interactions.
     """
     
-    def __init__(self, width=1280, height=720):
+    def __init__(self, width=1280, height=720, cache_bytes=256 * 1024 * 1024, raster_cache_dir=None):
         """
         Initialize the presentation controller.
         
         Args:
             width: Width of the presentation window
             height: Height of the presentation window
+            cache_bytes: Memory budget for rendered PDF pages
+            raster_cache_dir: Directory to keep rendered pages in across runs
+                (e.g. raster_cache.DEFAULT_CACHE_DIR), None to not use a disk cache
         """
         self.width = width
         self.height = height
+        self.cache_bytes = cache_bytes
+        self.disk_cache = DiskRasterCache(raster_cache_dir) if raster_cache_dir else None
         self.slide_images = []
         self.slide_num = 0
-        self.annotations = [[]]
-        self.annot_num = 0
-        self.annot_start = False
+        # Per-slide annotations with undo/redo, rasterized as their points arrive
+        self.annotation_store = AnnotationStore(width, height, thickness=6, line_type=cv2.LINE_8)
+        self.zoom_level = 1.0
+        self.zoom_center = None  # Viewport center in normalized page coordinates
         self.webcam_width = int(213 * 1.2)  # Width of the webcam preview
         self.webcam_height = int(120 * 1.2)  # Height of the webcam preview
         self.file_path = None
         self.file_name = None
+        self.load_count = 0  # bumped by load_file, so a reloaded file gets a fresh base layer
+        # Layered compositing: cached base layer and the key it was built for
+        self.base = None
+        self.base_key = None
+        self.frame_buffer = None
         
     def load_file(self, file_path):
         """
@@ -43,29 +58,25 @@ class PresentationController:
         print(f"Attempting to load file: {file_path}")
         self.file_path = file_path
         self.file_name = os.path.basename(file_path)
+        self.load_count += 1
         
         # Clear any existing slides
+        if isinstance(self.slide_images, SlideDeck):
+            self.slide_images.close()
         self.slide_images = []
         self.slide_num = 0
-        self.annotations = [[]]
-        self.annot_num = 0
+        self.annotation_store.reset()
+        self.annotation_store.set_slide(0)
         
         try:
             if file_path.lower().endswith(".pdf"):
                 print("Loading PDF file...")
-                # Load PDF slides
-                doc = fitz.open(file_path)
-                print(f"PDF loaded with {len(doc)} pages")
-                
-                for page_num, page in enumerate(doc):
-                    print(f"Processing page {page_num+1}/{len(doc)}")
-                    pix = page.get_pixmap(alpha=False)
-                    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3)
-                    # Convert from RGB to BGR (OpenCV format)
-                    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                    self.slide_images.append(img)
-                
-                print(f"Successfully loaded {len(self.slide_images)} slides from PDF")
+                # Pages are rasterized on demand when they are first shown
+                self.slide_images = SlideDeck.open(file_path, size=(self.width, self.height),
+                                                   cache_bytes=self.cache_bytes,
+                                                   disk_cache=self.disk_cache)
+                print(f"PDF loaded with {len(self.slide_images)} pages")
+                self.prefetch_slides()
                 return True
                 
             elif file_path.lower().endswith(".pptx"):
@@ -129,7 +140,8 @@ class PresentationController:
         """Move to the next slide if available."""
         if self.slide_num < len(self.slide_images) - 1:
             self.slide_num += 1
-            self.clear_annotations()
+            self.annotation_store.set_slide(self.slide_num)
+            self.prefetch_slides()
             return True
         return False
     
@@ -137,44 +149,148 @@ class PresentationController:
         """Move to the previous slide if available."""
         if self.slide_num > 0:
             self.slide_num -= 1
-            self.clear_annotations()
+            self.annotation_store.set_slide(self.slide_num)
+            self.prefetch_slides()
             return True
         return False
     
+    def first_slide(self):
+        """Jump to the first slide."""
+        return self.go_to_slide(0)
+    
+    def last_slide(self):
+        """Jump to the last slide."""
+        return self.go_to_slide(len(self.slide_images) - 1)
+    
+    def go_to_slide(self, slide_num):
+        """Show another slide, keeping each slide's annotations."""
+        if not 0 <= slide_num < len(self.slide_images):
+            return False
+        self.slide_num = slide_num
+        self.annotation_store.set_slide(slide_num)
+        self.prefetch_slides()
+        return True
+    
+    def zoom(self, step, min_zoom=0.5, max_zoom=2.0):
+        """Change the zoom level by `step`, within [min_zoom, max_zoom]."""
+        self.zoom_level = min(max(self.zoom_level + step, min_zoom), max_zoom)
+    
+    def reset_zoom(self):
+        """Show the whole slide again."""
+        self.zoom_level = 1.0
+        self.zoom_center = None
+    
+    def register_gestures(self, engine, zoom_step=0.1):
+        """
+        Bind the controller's actions to a gestures.GestureEngine, so the
+        same gesture table drives both the controller and apk.py. Call
+        end_annotation() on frames where the engine's active gesture is not DRAW.
+        
+        Args:
+            engine: The GestureEngine to bind
+            zoom_step: Zoom change per zoom gesture
+        """
+        def pan(hand):
+            if self.zoom_level <= 1.0:
+                return False
+            cx, cy = hand["center"]
+            self.zoom_center = (float(np.interp(cx, [self.width // 2, self.width], [0, 1])),
+                                float(np.interp(cy, [150, self.height - 150], [0, 1])))
+        
+        def draw(hand):
+            self.start_annotation()
+            self.add_annotation_point(pointer_position(hand, self.width, self.height))
+        
+        engine.bind_all({
+            "PREV_SLIDE": lambda hand: self.prev_slide(),
+            "NEXT_SLIDE": lambda hand: self.next_slide(),
+            "CLEAR_ANNOTATIONS": lambda hand: self.clear_annotations(),
+            "ZOOM_IN": lambda hand: self.zoom(zoom_step),
+            "ZOOM_OUT": lambda hand: self.zoom(-zoom_step),
+            "RESET_ZOOM": lambda hand: self.reset_zoom(),
+            "FIRST_SLIDE": lambda hand: self.first_slide(),
+            "LAST_SLIDE": lambda hand: self.last_slide(),
+            "PAN": pan,
+            "DRAW": draw,
+            "ERASE": lambda hand: self.erase_last_annotation(),
+            "SWIPE_LEFT": lambda hand: self.next_slide(),
+            "SWIPE_RIGHT": lambda hand: self.prev_slide(),
+            "CIRCLE_CW": lambda hand: self.reset_zoom(),
+            "CIRCLE_CCW": lambda hand: self.reset_zoom(),
+        })
+    
+    def prefetch_slides(self):
+        """Render the slides around the current one in the background."""
+        if isinstance(self.slide_images, SlideDeck):
+            self.slide_images.prefetch(self.slide_num)
+    
     def clear_annotations(self):
         """Clear all annotations on the current slide."""
-        self.annotations = [[]]
-        self.annot_num = 0
-        self.annot_start = False
+        return self.annotation_store.clear()
         
     def erase_last_annotation(self):
         """Erase the last annotation on the current slide."""
-        if self.annotations and len(self.annotations) > 1:
-            self.annotations.pop()
-            self.annot_num = max(0, self.annot_num - 1)
-            return True
-        return False
+        return self.annotation_store.erase_last()
+    
+    def undo_annotation(self):
+        """Undo the last drawn, erased or cleared annotation on the current slide."""
+        return self.annotation_store.undo()
+    
+    def redo_annotation(self):
+        """Redo the last undone annotation change on the current slide."""
+        return self.annotation_store.redo()
+    
+    def export_annotations(self, out_path, background=True):
+        """
+        Write the PDF with every slide's annotations added as ink annotations.
+        
+        Args:
+            out_path: Destination PDF file
+            background: Export on a thread and return immediately
+            
+        Returns:
+            The PDFExportJob (poll its status() for progress), or None if the
+            loaded file is not a PDF
+        """
+        if not isinstance(self.slide_images, SlideDeck):
+            print("Only PDF presentations can be exported")
+            return None
+        self.annotation_store.end_stroke()
+        job = PDFExportJob(self.file_path, out_path, self.annotation_store.snapshot(),
+                           (self.width, self.height), thickness=6)
+        if background:
+            return job.start()
+        job.run()
+        return job
     
     def start_annotation(self):
         """Start a new annotation line."""
-        if not self.annot_start:
-            self.annot_start = True
-            self.annot_num += 1
-            self.annotations.append([])
+        if not self.annotation_store.drawing:
+            transform = None
+            if isinstance(self.slide_images, SlideDeck):
+                # Remember the viewport, so the export places the line on the page
+                transform = self.slide_images.viewport_transform(self.slide_num, self.zoom_level,
+                                                                 self.zoom_center)
+            self.annotation_store.begin_stroke(transform)
     
     def add_annotation_point(self, point):
         """Add a point to the current annotation line."""
-        if self.annot_start and point:
-            self.annotations[self.annot_num].append(point)
+        if point:
+            self.annotation_store.add_point(point)
     
     def end_annotation(self):
         """End the current annotation line."""
-        self.annot_start = False
+        self.annotation_store.end_stroke()
     
     def render_frame(self, webcam_frame, hand_data=None, show_debug=True, gesture_action=None):
         """
         Render a frame of the presentation with annotations and webcam.
         
+        The frame is composited in layers: a cached base layer holding the
+        slide, HUD text and gesture-area guide is only rebuilt when one of
+        them changes (see base_layer); the annotation layer, pointer, webcam
+        preview and action text are drawn on a copy of it every frame.
+        
         Args:
             webcam_frame: The webcam feed frame
             hand_data: Data about the detected hand for visualizing pointers
@@ -182,7 +298,8 @@ class PresentationController:
             gesture_action: The current gesture action being performed
             
         Returns:
-            The rendered frame
+            The rendered frame. The buffer is reused by the next call, so
+            copy it if it has to be kept.
         """
         # Ensure hand_data has default values if it's None
         if hand_data is None:
@@ -191,6 +308,88 @@ class PresentationController:
                 'gesture_thresh_y': 300,
                 'pointer_pos': None
             }
+        
+        base = self.base_layer(hand_data, show_debug)
+        if self.frame_buffer is None or self.frame_buffer.shape != base.shape:
+            self.frame_buffer = np.empty_like(base)
+        slide_current = self.frame_buffer
+        np.copyto(slide_current, base)
+        h, w = slide_current.shape[:2]
+        
+        if self.slide_images:
+            # Annotations, rasterized incrementally as they were drawn
+            self.annotation_store.composite(slide_current)
+            
+            # If we have hand data and it includes a pointer position, draw it
+            if hand_data and 'pointer_pos' in hand_data and hand_data['pointer_pos']:
+                pointer_pos = hand_data['pointer_pos']
+                cv2.circle(slide_current, pointer_pos, 8, (0, 0, 255), cv2.FILLED)
+                cv2.circle(slide_current, pointer_pos, 12, (0, 0, 0), 2)
+        
+        # Add webcam feed
+        webcam_small = cv2.resize(webcam_frame, (self.webcam_width, self.webcam_height))
+        slide_current[h - self.webcam_height:h, w - self.webcam_width:w] = webcam_small
+        
+        if not self.slide_images:
+            return slide_current
+        
+        # Show current action if any
+        if gesture_action:
+            # Map action code to readable text
+            action_text = gesture_action
+            if gesture_action == "NEXT_SLIDE":
+                action_text = "Next Slide"
+            elif gesture_action == "PREV_SLIDE":
+                action_text = "Previous Slide"
+            elif gesture_action == "CLEAR_ANNOTATIONS":
+                action_text = "Clear Annotations"
+            elif gesture_action == "POINTER":
+                action_text = "Pointer Mode"
+            elif gesture_action == "DRAW":
+                action_text = "Drawing Mode"
+            elif gesture_action == "ERASE":
+                action_text = "Erase Last"
+            
+            # Show the action text
+            put_text_with_background(slide_current, action_text, (10, h - 40), 
+                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 
+                                   (0, 0, 200), 2, 10)
+        
+        return slide_current
+    
+    def base_layer(self, hand_data, show_debug):
+        """
+        Get the static part of the frame, rebuilding it only when the slide,
+        zoom or display settings changed.
+        
+        Args:
+            hand_data: Hand data, with the gesture area thresholds when show_debug is set
+            show_debug: Whether the gesture area guide is shown
+            
+        Returns:
+            The cached base layer (do not draw on it)
+        """
+        # The thresholds are only drawn, and only required, with show_debug
+        thresholds = (hand_data['gesture_thresh_x'], hand_data['gesture_thresh_y']) if show_debug else None
+        key = (self.load_count, len(self.slide_images), self.slide_num,
+               self.zoom_level, self.zoom_center, show_debug, thresholds,
+               self.width, self.height, self.file_name)
+        if key != self.base_key:
+            self.base = self.build_base_layer(hand_data, show_debug)
+            self.base_key = key
+        return self.base
+    
+    def build_base_layer(self, hand_data, show_debug):
+        """
+        Draw the static layer: slide, HUD text and gesture area guide.
+        
+        Args:
+            hand_data: Hand data with the gesture area thresholds
+            show_debug: Whether to draw the gesture area guide
+            
+        Returns:
+            The base layer image
+        """
         # Check if we have any slides loaded
         if not self.slide_images:
             # Create a blank image that says "No presentation loaded"
@@ -213,66 +412,26 @@ class PresentationController:
             instructionX = (blank.shape[1] - instructionsize[0]) // 2
             
             cv2.putText(blank, instruction, (instructionX, textY + 50), font, 0.7, (100, 100, 100), 1)
-            
-            # Resize and place webcam feed
-            webcam_small = cv2.resize(webcam_frame, (self.webcam_width, self.webcam_height))
-            h, w = blank.shape[:2]
-            blank[h - self.webcam_height:h, w - self.webcam_width:w] = webcam_small
-            
             return blank
         
-        # Get the current slide and resize it to fit the window
-        slide_current = cv2.resize(self.slide_images[self.slide_num], (self.width, self.height))
-        
-        # Draw all annotations
-        for annotation in self.annotations:
-            for j in range(1, len(annotation)):
-                cv2.line(slide_current, annotation[j - 1], annotation[j], (0, 0, 255), 6)
-        
-        # If we have hand data and it includes a pointer position, draw it
-        if hand_data and 'pointer_pos' in hand_data and hand_data['pointer_pos']:
-            pointer_pos = hand_data['pointer_pos']
-            cv2.circle(slide_current, pointer_pos, 8, (0, 0, 255), cv2.FILLED)
-            cv2.circle(slide_current, pointer_pos, 12, (0, 0, 0), 2)
-        
-        # Add webcam feed
-        webcam_small = cv2.resize(webcam_frame, (self.webcam_width, self.webcam_height))
-        h, w = slide_current.shape[:2]
-        slide_current[h - self.webcam_height:h, w - self.webcam_width:w] = webcam_small
+        # Get the current slide; PDF pages are already rendered at window size
+        if isinstance(self.slide_images, SlideDeck) and (self.zoom_level != 1.0 or self.zoom_center is not None):
+            slide = self.slide_images.render_viewport(self.slide_num, self.zoom_level, self.zoom_center)
+        else:
+            slide = self.slide_images[self.slide_num]
+        base = fit_to_frame(slide, self.width, self.height)
         
         # Add slide counter
         slide_text = f"Slide {self.slide_num + 1}/{len(self.slide_images)}"
-        cv2.putText(slide_current, slide_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+        cv2.putText(base, slide_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
         
         # Add filename
         if self.file_name:
-            cv2.putText(slide_current, self.file_name, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (100, 100, 100), 1)
+            cv2.putText(base, self.file_name, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (100, 100, 100), 1)
         
         # Draw gesture area indicator (dotted rectangle in top-right)
         if show_debug:
-            draw_dotted_rect(slide_current, (hand_data['gesture_thresh_x'], 0), 
+            draw_dotted_rect(base, (hand_data['gesture_thresh_x'], 0), 
                            (self.width, hand_data['gesture_thresh_y']), (0, 255, 0), 2)
         
-        # Show current action if any
-        if gesture_action:
-            # Map action code to readable text
-            action_text = gesture_action
-            if gesture_action == "NEXT_SLIDE":
-                action_text = "Next Slide"
-            elif gesture_action == "PREV_SLIDE":
-                action_text = "Previous Slide"
-            elif gesture_action == "CLEAR_ANNOTATIONS":
-                action_text = "Clear Annotations"
-            elif gesture_action == "POINTER":
-                action_text = "Pointer Mode"
-            elif gesture_action == "DRAW":
-                action_text = "Drawing Mode"
-            elif gesture_action == "ERASE":
-                action_text = "Erase Last"
-            
-            # Show the action text
-            put_text_with_background(slide_current, action_text, (10, h - 40), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 
-                                   (0, 0, 200), 2, 10)
-        
-        return slide_current
+        return base
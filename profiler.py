@@ -0,0 +1,140 @@
+import csv
+import json
+import time
+
+import cv2
+import numpy as np
+
+
+class StageProfiler:
+    """
+    Low-overhead per-stage latency timer for the frame loop. Call
+    begin_frame() at the top of the loop and lap(name) after each stage;
+    every lap records the time since the previous one into a rolling window
+    per stage, from which p50/p95/p99 are computed on demand.
+    """
+
+    def __init__(self, window=600, enabled=True):
+        """
+        Args:
+            window: Number of recent samples kept per stage
+            enabled: When False, lap() and begin_frame() do nothing
+        """
+        self.window = window
+        self.enabled = enabled
+        self.samples = {}   # stage name -> ring buffer of durations in seconds
+        self.counts = {}    # stage name -> total number of samples
+        self.totals = {}    # stage name -> total time in seconds
+        self.order = []
+        self.frames = 0
+        self.dropped = 0
+        self.last_dropped = 0
+        self.frame_start = None
+        self.last = None
+        self.hud_lines = []
+        self.hud_time = 0
+
+    def begin_frame(self):
+        """Start timing a new frame."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self._add("frame", now - self.frame_start)
+        self.frame_start = self.last = now
+        self.frames += 1
+
+    def lap(self, name):
+        """Record the time since the previous lap (or frame start) under `name`."""
+        if not self.enabled or self.last is None:
+            return
+        now = time.perf_counter()
+        self._add(name, now - self.last)
+        self.last = now
+
+    def _add(self, name, seconds):
+        buf = self.samples.get(name)
+        if buf is None:
+            buf = self.samples[name] = np.zeros(self.window)
+            self.counts[name] = 0
+            self.totals[name] = 0.0
+            self.order.append(name)
+        buf[self.counts[name] % self.window] = seconds
+        self.counts[name] += 1
+        self.totals[name] += seconds
+
+    def update_dropped(self, total_dropped):
+        """
+        Track a source's running dropped-frame counter (e.g. CameraStream.dropped).
+        A counter that goes backwards is treated as a new source.
+        """
+        if total_dropped < self.last_dropped:
+            self.last_dropped = 0
+        self.dropped += total_dropped - self.last_dropped
+        self.last_dropped = total_dropped
+
+    def summary(self):
+        """
+        Latency statistics per stage.
+
+        Returns:
+            Dict of stage name -> dict with count, mean, p50, p95, p99 and max in milliseconds
+        """
+        stats = {}
+        for name in self.order:
+            n = min(self.counts[name], self.window)
+            recent = self.samples[name][:n] * 1000
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+            stats[name] = {
+                "count": self.counts[name],
+                "mean": self.totals[name] * 1000 / self.counts[name],
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(recent.max()),
+            }
+        return stats
+
+    def draw_hud(self, img, position=(10, 90), refresh=0.5):
+        """
+        Draw the per-stage percentiles onto an image. The text is only
+        recomputed every `refresh` seconds to keep the HUD cheap.
+
+        Args:
+            img: The image to draw on
+            position: Top-left corner of the HUD text
+            refresh: Seconds between statistics updates
+        """
+        now = time.perf_counter()
+        if now - self.hud_time > refresh:
+            self.hud_time = now
+            self.hud_lines = [f"{'stage':<14}{'p50':>7}{'p95':>7}{'p99':>7} ms"]
+            for name, s in self.summary().items():
+                self.hud_lines.append(f"{name:<14}{s['p50']:7.1f}{s['p95']:7.1f}{s['p99']:7.1f}")
+            self.hud_lines.append(f"frames {self.frames}  dropped {self.dropped}")
+
+        x, y = position
+        cv2.rectangle(img, (x - 5, y - 15), (x + 300, y + 18 * len(self.hud_lines) - 8), (0, 0, 0), -1)
+        for i, line in enumerate(self.hud_lines):
+            cv2.putText(img, line, (x, y + 18 * i), cv2.FONT_HERSHEY_PLAIN, 1, (0, 255, 0), 1)
+        return img
+
+    def dump(self, path):
+        """
+        Write the statistics to a .csv or .json file (chosen by extension).
+
+        Args:
+            path: Output file path
+        """
+        stats = self.summary()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+                for name, s in stats.items():
+                    writer.writerow([name, s["count"], f"{s['mean']:.3f}", f"{s['p50']:.3f}",
+                                     f"{s['p95']:.3f}", f"{s['p99']:.3f}", f"{s['max']:.3f}"])
+                writer.writerow(["dropped_frames", self.dropped, "", "", "", "", ""])
+        else:
+            with open(path, "w") as f:
+                json.dump({"frames": self.frames, "dropped": self.dropped, "stages": stats}, f, indent=2)
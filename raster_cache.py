@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "GestureFlow", "rasters")
+
+
+def document_hash(file_path, chunk_bytes=1024 * 1024):
+    """
+    Hash of a file's content, so renamed or copied decks still hit the
+    cache and edited ones never do, wherever the edit is. The file is read
+    in chunks, at about 1 GB/s, once per opened deck.
+
+    Args:
+        file_path: Path of the document
+        chunk_bytes: Bytes read at a time
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskRasterCache:
+    """
+    Persistent cache of rendered pages. Each page is stored as a raw uint8
+    .npy file named after the document hash, the page index and
+    the render size, and is memory-mapped on load, so reopening a known deck
+    skips rendering entirely. The directory is capped in size; the least
+    recently used files are deleted first.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=1024 * 1024 * 1024, stale_tmp_age=60.0):
+        """
+        Args:
+            directory: Cache directory (created if missing)
+            max_bytes: Size cap for all cached files together
+            stale_tmp_age: Temporary files older than this many seconds are
+                leftovers of interrupted writes and are deleted on startup
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_tmp(stale_tmp_age)
+        self.total_bytes = sum(size for _, _, size in self._entries())
+
+    def _remove_stale_tmp(self, max_age):
+        """Delete temporary files left behind by writes that never finished."""
+        oldest = time.time() - max_age
+        for name in os.listdir(self.directory):
+            if not name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime < oldest:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def _entries(self):
+        """List cached files as (last use time, path, size)."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def path_for(self, doc_hash, page_num, size):
+        """File path for a page rendered at `size` ((width, height) or None for native)."""
+        width, height = size if size is not None else (0, 0)
+        return os.path.join(self.directory, f"{doc_hash}_{page_num}_{width}x{height}.npy")
+
+    def get(self, doc_hash, page_num, size):
+        """
+        Load a cached page.
+
+        Returns:
+            Read-only memory-mapped (h, w, 3) uint8 array, or None on a miss
+        """
+        path = self.path_for(doc_hash, page_num, size)
+        try:
+            img = np.load(path, mmap_mode="r")
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return img
+
+    def put(self, doc_hash, page_num, size, img):
+        """Store a rendered page, evicting old files if over the size cap."""
+        path = self.path_for(doc_hash, page_num, size)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(img))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self.lock:
+            self.total_bytes += os.path.getsize(path)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until the cache is under 90% of its cap."""
+        entries = sorted(self._entries())
+        self.total_bytes = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+
+    def clear(self):
+        """Delete every cached page."""
+        with self.lock:
+            for _, path, _ in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.total_bytes = 0
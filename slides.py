@@ -0,0 +1,511 @@
+import multiprocessing as mp
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import fitz  # PyMuPDF for handling PDFs
+import numpy as np
+
+from raster_cache import document_hash
+
+
+class LRUCache:
+    """
+    Least-recently-used cache of NumPy arrays bounded by their total size in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes: Byte budget; the least recently used entries are evicted
+                once the cached arrays exceed it
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """Return the cached array for `key` (marking it recently used), or None."""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Cache an array, evicting old entries to stay within the byte budget."""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self.entries[key] = value
+        self.nbytes += value.nbytes
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+def pixmap_to_bgr(pix):
+    """
+    Convert a PyMuPDF pixmap to an OpenCV BGR image.
+
+    Args:
+        pix: fitz.Pixmap without alpha
+
+    Returns:
+        The image as an (h, w, 3) uint8 array
+    """
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+    # Convert from RGB to BGR (OpenCV format)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+def fit_page(rect, size):
+    """
+    Uniform scale and centering offset that fit a page into a display size.
+
+    Args:
+        rect: Page rectangle (fitz.Rect) in PDF points
+        size: (width, height) of the display, or None for native 72 dpi
+
+    Returns:
+        Tuple of (scale, offset_x, offset_y)
+    """
+    if size is None:
+        return 1.0, 0.0, 0.0
+    width, height = size
+    scale = min(width / rect.width, height / rect.height)
+    return scale, (width - rect.width * scale) / 2, (height - rect.height * scale) / 2
+
+
+def viewport_transform(rect, size, zoom=1.0, center=None):
+    """
+    Like fit_page, for a zoomed and panned view of the page: display pixels
+    are (page point - page origin) * scale + offset.
+
+    Args:
+        rect: Page rectangle (fitz.Rect) in PDF points
+        size: (width, height) of the display
+        zoom: Zoom factor relative to the fitted page
+        center: (x, y) viewport center in normalized page coordinates,
+            default the page center. Clamped so a zoomed-in viewport stays
+            on the page; a page smaller than the viewport along an axis stays
+            centered along it
+
+    Returns:
+        Tuple of (scale, offset_x, offset_y)
+    """
+    width, height = size
+    cx, cy = (0.5, 0.5) if center is None else center
+    scale = fit_page(rect, size)[0] * zoom
+    view_w, view_h = width / scale, height / scale
+
+    # Viewport center in page coordinates
+    px, py = rect.x0 + cx * rect.width, rect.y0 + cy * rect.height
+    if view_w < rect.width:
+        px = min(max(px, rect.x0 + view_w / 2), rect.x1 - view_w / 2)
+    else:
+        px = rect.x0 + rect.width / 2
+    if view_h < rect.height:
+        py = min(max(py, rect.y0 + view_h / 2), rect.y1 - view_h / 2)
+    else:
+        py = rect.y0 + rect.height / 2
+    return scale, (rect.x0 - px) * scale + width / 2, (rect.y0 - py) * scale + height / 2
+
+
+def letterbox(img, size, offset, out=None):
+    """
+    Place a rendered page on a white canvas of the display size.
+
+    Args:
+        img: Rendered page
+        size: (width, height) of the canvas
+        offset: (x, y) of the page's top-left corner on the canvas
+        out: Optional (height, width, 3) array to draw into instead of a new canvas
+
+    Returns:
+        The letterboxed image
+    """
+    width, height = size
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+    out[:] = 255
+    x0, y0 = int(round(offset[0])), int(round(offset[1]))
+    h, w = min(img.shape[0], height - y0), min(img.shape[1], width - x0)
+    out[y0:y0 + h, x0:x0 + w] = img[:h, :w]
+    return out
+
+
+def render_page(page, size, out=None):
+    """
+    Render a page at display resolution, letterboxed to `size`.
+
+    Args:
+        page: fitz.Page
+        size: (width, height) of the display
+        out: Optional array to render into, see letterbox
+
+    Returns:
+        (height, width, 3) BGR image
+    """
+    scale, offset_x, offset_y = fit_page(page.rect, size)
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+    return letterbox(pixmap_to_bgr(pix), size, (offset_x, offset_y), out)
+
+
+# Per-process state of rasterize_pages workers
+_worker_doc = None
+_worker_shm = None
+_worker_frames = None
+
+
+def _init_raster_worker(file_path, shm_name, shape):
+    """Open the document and attach the shared frame buffer once per worker process."""
+    global _worker_doc, _worker_shm, _worker_frames
+    _worker_doc = fitz.open(file_path)
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_frames = np.ndarray(shape, dtype=np.uint8, buffer=_worker_shm.buf)
+
+
+def _render_chunk(task):
+    """Render (slot, page) pairs into the shared frame buffer."""
+    size, jobs = task
+    for slot, page_num in jobs:
+        render_page(_worker_doc[page_num], size, out=_worker_frames[slot])
+    return jobs
+
+
+def rasterize_pages(file_path, size, pages=None, processes=None, chunk_pages=4, window_pages=32,
+                    stop=None):
+    """
+    Render many pages in parallel. Pages are split into small chunks across
+    a process pool; each worker opens its own fitz document and writes pixels
+    straight into shared memory, so nothing is pickled but page numbers.
+    Pages are yielded as their chunk finishes, with the first page in a
+    chunk of its own so it is available almost immediately. Workers are
+    spawned rather than forked, since the caller usually runs camera,
+    prefetch and export threads that a fork would copy mid-operation.
+
+    Args:
+        file_path: PDF path
+        size: (width, height) to render at
+        pages: Page numbers to render (default: all, in order)
+        processes: Number of worker processes (default: CPU count)
+        chunk_pages: Pages per task
+        window_pages: Pages buffered in shared memory at a time
+        stop: Optional threading.Event; once set, no further chunks are
+            collected and the pool is terminated
+
+    Yields:
+        (page_num, image) pairs. The image is a view into shared memory that
+        is only valid until the next window starts, so copy it to keep it
+    """
+    if pages is None:
+        with fitz.open(file_path) as doc:
+            pages = list(range(len(doc)))
+    if not pages:
+        return
+    width, height = size
+    window_pages = max(1, min(window_pages, len(pages)))
+    shape = (window_pages, height, width, 3)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        with mp.get_context("spawn").Pool(processes, initializer=_init_raster_worker,
+                                          initargs=(file_path, shm.name, shape)) as pool:
+            for start in range(0, len(pages), window_pages):
+                window = list(enumerate(pages[start:start + window_pages]))
+                if start == 0:
+                    chunks = [window[:1]] + [window[i:i + chunk_pages] for i in range(1, len(window), chunk_pages)]
+                else:
+                    chunks = [window[i:i + chunk_pages] for i in range(0, len(window), chunk_pages)]
+                for jobs in pool.imap_unordered(_render_chunk, [(size, jobs) for jobs in chunks]):
+                    if stop is not None and stop.is_set():
+                        return
+                    for slot, page_num in jobs:
+                        yield page_num, frames[slot]
+    finally:
+        del frames
+        shm.close()
+        shm.unlink()
+
+
+class SlideDeck:
+    """
+    Slides of an open PDF, rasterized on demand. Behaves like the list of
+    slide images the presentation code used to build up front, but only
+    pages that are actually shown get rendered, and rendered pages live in
+    an LRU cache with a byte budget. Opening a deck is constant time and
+    memory stays bounded regardless of page count.
+
+    prefetch() renders the neighbours of the current slide on a small thread
+    pool so that changing slides does not have to wait for a raster.
+    """
+
+    def __init__(self, doc, size=None, cache_bytes=256 * 1024 * 1024, prefetch_radius=2, workers=2,
+                 disk_cache=None, doc_hash=None, view_cache_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            doc: An open fitz.Document
+            size: Optional (width, height) display resolution to render slides at
+            cache_bytes: Byte budget for rendered pages
+            prefetch_radius: Number of slides on each side of the current one to prefetch
+            workers: Number of prefetch threads
+            disk_cache: Optional raster_cache.DiskRasterCache consulted before rendering
+            doc_hash: raster_cache.document_hash of the document, required with disk_cache
+            view_cache_bytes: Byte budget for rendered zoom viewports
+        """
+        self.doc = doc
+        self.disk_cache = disk_cache if doc_hash else None
+        self.doc_hash = doc_hash
+        self.size = size
+        self.page_count = len(doc)
+        self.cache = LRUCache(cache_bytes)
+        self.prefetch_radius = prefetch_radius
+        self.doc_lock = threading.Lock()    # PyMuPDF documents are not thread safe
+        self.cache_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="SlidePrefetch")
+        self.pending = {}  # page number -> Future of a queued or running prefetch
+        self.transforms = {}  # page number -> (scale, offset_x, offset_y), see page_transform
+        self.file_path = None
+        self.raster_thread = None
+        self.raster_stop = threading.Event()  # set by close() to cancel rasterize_all
+        self.view_cache = LRUCache(view_cache_bytes)  # zoomed viewports, see render_viewport
+
+    @classmethod
+    def open(cls, file_path, disk_cache=None, **kwargs):
+        """Open a PDF file as a deck, hashing it if a disk cache is used."""
+        doc_hash = document_hash(file_path) if disk_cache is not None else None
+        deck = cls(fitz.open(file_path), disk_cache=disk_cache, doc_hash=doc_hash, **kwargs)
+        deck.file_path = file_path
+        return deck
+
+    def __len__(self):
+        return self.page_count
+
+    def __bool__(self):
+        return self.page_count > 0
+
+    def __getitem__(self, page_num):
+        if page_num < 0:
+            page_num += self.page_count
+        if not 0 <= page_num < self.page_count:
+            raise IndexError(f"Slide {page_num} out of range")
+        img = self._cached(page_num)
+        if img is None:
+            future = self.pending.pop(page_num, None)
+            if future is not None and not future.cancel():
+                # Already being prefetched: wait for it instead of rendering twice
+                future.result()
+                img = self._cached(page_num)
+        if img is None:
+            img = self._load(page_num)
+        return img
+
+    def __iter__(self):
+        for page_num in range(self.page_count):
+            yield self[page_num]
+
+    def _cached(self, page_num):
+        with self.cache_lock:
+            return self.cache.get(page_num)
+
+    def page_transform(self, page_num):
+        """
+        Mapping from page coordinates (PDF points) to display pixels.
+
+        Returns:
+            Tuple of (scale, offset_x, offset_y): the page is scaled uniformly
+            to fit `size` and centered, leaving letterbox bars on the sides
+            that don't fill the display
+        """
+        transform = self.transforms.get(page_num)
+        if transform is None:
+            with self.doc_lock:
+                rect = self.doc[page_num].rect
+            transform = fit_page(rect, self.size)
+            self.transforms[page_num] = transform
+        return transform
+
+    def render(self, page_num):
+        """
+        Rasterize one page, bypassing the cache. With `size` set the page is
+        rendered straight at display resolution and letterboxed, so it never
+        has to be resized afterwards.
+        """
+        scale, offset_x, offset_y = self.page_transform(page_num)
+        with self.doc_lock:
+            pix = self.doc[page_num].get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        img = pixmap_to_bgr(pix)
+        if self.size is None:
+            return img
+        return letterbox(img, self.size, (offset_x, offset_y))
+
+    def render_viewport(self, page_num, zoom, center=None, pan_step=0.01):
+        """
+        Slide as seen through a zoomed viewport. Only the visible part of the
+        page is rendered, straight from the PDF at the zoomed resolution, so
+        zoomed text stays sharp and no oversized raster is ever allocated.
+        Viewports are cached per page, zoom and (quantized) pan position and
+        reused until one of them changes.
+
+        Args:
+            page_num: Slide number
+            zoom: Zoom factor relative to the fitted slide (below 1 shrinks it)
+            center: (x, y) viewport center in normalized page coordinates
+                (0..1); defaults to the page center. Clamped so a zoomed-in
+                viewport stays on the page
+            pan_step: Pan quantization, in normalized page units
+
+        Returns:
+            Display-size BGR image (shared with the cache; copy before drawing)
+        """
+        if self.size is None:
+            raise ValueError("render_viewport needs a deck with a display size")
+        if center is None:
+            center = (0.5, 0.5)
+        if zoom == 1.0 and center == (0.5, 0.5):
+            return self[page_num]
+        cx, cy = self._quantize(center, pan_step)
+        key = (page_num, round(zoom, 3), round(cx, 4), round(cy, 4))
+        with self.cache_lock:
+            img = self.view_cache.get(key)
+        if img is None:
+            img = self._render_view(page_num, zoom, cx, cy)
+            with self.cache_lock:
+                self.view_cache.put(key, img)
+        return img
+
+    def viewport_transform(self, page_num, zoom=1.0, center=None, pan_step=0.01):
+        """
+        Mapping from page coordinates (PDF points) to display pixels of the
+        view render_viewport shows for the same arguments, e.g. to place
+        annotations drawn on a zoomed slide on the page.
+
+        Returns:
+            Tuple of (scale, offset_x, offset_y), see page_transform
+        """
+        if self.size is None:
+            raise ValueError("viewport_transform needs a deck with a display size")
+        if center is None:
+            center = (0.5, 0.5)
+        if zoom == 1.0 and center == (0.5, 0.5):
+            return self.page_transform(page_num)
+        with self.doc_lock:
+            rect = self.doc[page_num].rect
+        return viewport_transform(rect, self.size, zoom, self._quantize(center, pan_step))
+
+    @staticmethod
+    def _quantize(center, pan_step):
+        return tuple(round(c / pan_step) * pan_step for c in center)
+
+    def _render_view(self, page_num, zoom, cx, cy):
+        width, height = self.size
+        with self.doc_lock:
+            rect = self.doc[page_num].rect
+        scale, offset_x, offset_y = viewport_transform(rect, self.size, zoom, (cx, cy))
+        x0, y0 = rect.x0 - offset_x / scale, rect.y0 - offset_y / scale
+        view = fitz.Rect(x0, y0, x0 + width / scale, y0 + height / scale)
+        clip = fitz.Rect(view).intersect(rect)
+        with self.doc_lock:
+            pix = self.doc[page_num].get_pixmap(matrix=fitz.Matrix(scale, scale), clip=clip, alpha=False)
+        offset = ((clip.x0 - view.x0) * scale, (clip.y0 - view.y0) * scale)
+        return letterbox(pixmap_to_bgr(pix), self.size, offset)
+
+    def prefetch(self, page_num, radius=None):
+        """
+        Queue the slides around `page_num` for background rendering, nearest
+        first. Queued work for slides that are no longer nearby is cancelled,
+        so jumping across the deck does not leave a backlog.
+
+        Args:
+            page_num: The slide currently on screen
+            radius: Slides on each side to prefetch (defaults to prefetch_radius)
+        """
+        if radius is None:
+            radius = self.prefetch_radius
+        wanted = [page_num]
+        for offset in range(1, radius + 1):
+            wanted += [page_num + offset, page_num - offset]
+        wanted = [p for p in wanted if 0 <= p < self.page_count]
+
+        for p, future in list(self.pending.items()):
+            if future.done() or (p not in wanted and future.cancel()):
+                del self.pending[p]
+        for p in wanted:
+            if p not in self.pending and self._cached(p) is None:
+                self.pending[p] = self.executor.submit(self._prefetch_page, p)
+
+    def _prefetch_page(self, page_num):
+        if self._cached(page_num) is None:
+            self._load(page_num)
+
+    def _load(self, page_num):
+        """Get a page from the disk cache or render it, and cache it in memory."""
+        img = None
+        if self.disk_cache is not None:
+            img = self.disk_cache.get(self.doc_hash, page_num, self.size)
+        if img is None:
+            img = self.render(page_num)
+            if self.disk_cache is not None:
+                self.disk_cache.put(self.doc_hash, page_num, self.size, img)
+        with self.cache_lock:
+            self.cache.put(page_num, img)
+        return img
+
+    def rasterize_all(self, processes=None, background=True):
+        """
+        Render every page that is not on disk yet with rasterize_pages and
+        store it in the disk cache, to warm it for a new deck. Pages become
+        available to _load as they finish. The in-memory cache is left alone,
+        so the pages on screen are not evicted by the rest of the deck.
+        close() cancels a run that is still going.
+
+        Args:
+            processes: Number of worker processes (default: CPU count)
+            background: Run on a thread and return immediately
+
+        Returns:
+            The background thread, or None when run in the foreground
+        """
+        if self.file_path is None or self.size is None or self.disk_cache is None:
+            raise ValueError("rasterize_all needs a deck opened from a file with a display size and a disk cache")
+        pages = [p for p in range(self.page_count)
+                 if not os.path.exists(self.disk_cache.path_for(self.doc_hash, p, self.size))]
+
+        def run():
+            for page_num, img in rasterize_pages(self.file_path, self.size, pages, processes,
+                                                 stop=self.raster_stop):
+                self.disk_cache.put(self.doc_hash, page_num, self.size, img)
+
+        if not background:
+            run()
+            return None
+        self.raster_thread = threading.Thread(target=run, name="SlideRasterizer", daemon=True)
+        self.raster_thread.start()
+        return self.raster_thread
+
+    def close(self):
+        """Stop prefetching, drop cached pages and close the document."""
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
+        self.raster_stop.set()
+        if self.raster_thread is not None:
+            self.raster_thread.join()
+            self.raster_thread = None
+        self.cache.clear()
+        self.view_cache.clear()
+        self.doc.close()
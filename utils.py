@@ -242,3 +242,21 @@ def create_blank_image(width, height, color=(255, 255, 255)):
     img = np.ones((height, width, 3), dtype=np.uint8)
     img[:] = color
     return img
+
+def fit_to_frame(image, width, height):
+    """
+    Get a writable copy of an image at the given frame size. Images that
+    already have the right size (e.g. slides rendered at display resolution)
+    are only copied, not resized.
+    
+    Args:
+        image: The source image
+        width: Frame width
+        height: Frame height
+        
+    Returns:
+        A new image of size (height, width)
+    """
+    if image.shape[0] == height and image.shape[1] == width:
+        return image.copy()
+    return cv2.resize(image, (width, height))